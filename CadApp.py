@@ -1,5 +1,6 @@
 import os
 import sys
+import time
 cad_dir = os.path.dirname(os.path.realpath(__file__))
 pycad_dir = os.path.realpath(cad_dir + '/../PyCAD')
 sys.path.append(pycad_dir)
@@ -15,7 +16,11 @@ from Ribbon import GrayedButton
 
 from points import Points
 from points import type as points_type
+import pointsfile
+import livecurves
 
+refresh_interval = 1.0 / 60 # seconds; while dragging, the view is redrawn at most this often
+game_process = None # the game started with the Game button, sent each edit to the curves
 
 class PointEditing(InputMode):
     def __init__(self, front):
@@ -24,6 +29,12 @@ class PointEditing(InputMode):
         self.front = front
         self.points = None
         
+        # a stroke is from pressing the left button to letting it go, and is undone in one go
+        self.stroke_start_points = None # the samples before the stroke
+        self.last_point = None
+        self.last_refresh_time = 0.0
+        self.refresh_pending = False
+        
     def GetTitle(self):
         return 'Point Editing ' + ('Front' if self.front else 'Rear')
         
@@ -31,19 +42,69 @@ class PointEditing(InputMode):
         return 'Drag on ' + ('Blue' if self.front else 'Red' ) + ' curve to modify it'
         
     def OnMouse(self, event):
+        if event.LeftDown():
+            self.EndStroke()
+            if self.points != None:
+                self.stroke_start_points = [list(point) for point in self.points.points]
+                self.last_point = None
+                
         if event.Moving():
-            if event.leftDown:
-                v = wx.GetApp().GetViewport()
-                p = cad.Digitize(cad.IPoint(event.x, event.y))
-                self.points.ModifyAtPoint(p.point, self.front)
-
-                v.need_update = True
-                v.need_refresh = True
-                wx.GetApp().frame.graphics_canvas.Refresh() 
+            if event.leftDown and self.points != None:
+                if self.stroke_start_points == None:
+                    self.stroke_start_points = [list(point) for point in self.points.points]
+                p = cad.Digitize(cad.IPoint(event.x, event.y)).point
+                # fill in every sample between this mouse position and the last, however fast the drag
+                if self.last_point == None:
+                    self.points.ModifyAtPoint(p, self.front)
+                else:
+                    self.points.ModifyBetween(self.last_point, p, self.front)
+                self.last_point = p
+                self.RequestRefresh()
+                
+        if event.LeftUp():
+            self.EndStroke()
                        
         if event.GetWheelRotation() != 0:
             wx.GetApp().GetViewport().OnWheelRotation(event.wheelRotation, event.x, event.y)
 
+    def EndStroke(self):
+        # make the whole stroke one undoable change
+        if self.stroke_start_points == None:
+            return
+        stroke_points = self.points.points
+        start_points = self.stroke_start_points
+        self.stroke_start_points = None
+        self.last_point = None
+        if stroke_points == start_points:
+            return
+        edited = Points()
+        edited.points = stroke_points
+        self.points.points = start_points
+        cad.CopyUndoably(self.points, edited)
+        self.RefreshView()
+        SendPointsToGame(self.points.points)
+        
+    def RequestRefresh(self):
+        # redraw now if the last redraw was long enough ago, otherwise once when it is
+        if self.refresh_pending:
+            return
+        wait = self.last_refresh_time + refresh_interval - time.perf_counter()
+        if wait <= 0.0:
+            self.RefreshView()
+        else:
+            self.refresh_pending = True
+            wx.CallLater(max(1, int(wait * 1000)), self.RefreshView)
+        
+    def RefreshView(self):
+        self.refresh_pending = False
+        self.last_refresh_time = time.perf_counter()
+        v = wx.GetApp().GetViewport()
+        v.need_update = True
+        v.need_refresh = True
+        wx.GetApp().frame.graphics_canvas.Refresh()
+        if self.stroke_start_points != None:
+            SendPointsToGame(self.points.points)
+
 front_editing = PointEditing(True)
 rear_editing = PointEditing(False)
     
@@ -62,6 +123,8 @@ class CadApp(SolidApp):
         SolidApp.RegisterObjectTypes(self)
         self.RegisterImportFileTypes(['points'], 'Points Files', ImportPointsFile)
         self.RegisterExportFileTypes(['points'], 'Points Files', ExportPointsFile)
+        self.RegisterImportFileTypes([pointsfile.binary_extension], 'Binary Points Files', ImportPointsFile)
+        self.RegisterExportFileTypes([pointsfile.binary_extension], 'Binary Points Files', ExportPointsFile)
 
     def AddExtraRibbonPages(self, ribbon):
         SolidApp.AddExtraRibbonPages(self, ribbon)
@@ -97,15 +160,51 @@ class CadApp(SolidApp):
         self.OnEdit(False)
         
     def OnGameButton(self, event):
-        ExportPointFilePath('line_lengths.points')
-        os.system('"C:\\Users\\Dan Heeks\\AppData\\Local\\Programs\\Python\\Python36-32\\python" game.py /i')
+        # starts the game without waiting for it; if it is already running, sends it the curves instead
+        global game_process
+        points = GetFirstPoints()
+        if game_process != None and points != None and SendPointsToGame(points.points):
+            return
+        # where the game, started in cad_dir, reads it from
+        ExportPointFilePath(os.path.join(cad_dir, 'line_lengths.points'))
+        game_process = livecurves.GameProcess(cad_dir)
+
+def GetFirstPoints():
+    doc = cad.GetApp()
+    object = doc.GetFirstChild()
+    while object:
+        if object.GetType() == points_type:
+            return object
+        object = doc.GetNextChild()
+    return None
+
+def SendPointsToGame(points):
+    # returns False if there is no game running
+    global game_process
+    if game_process == None:
+        return False
+    if not game_process.send(points):
+        game_process = None
+        return False
+    return True
 
 def ImportPointsFile():
     points = Points()
-    points.points = eval( open(cad.GetFilePathForImportExport(), "r").read() )
+    points.points = pointsfile.load(cad.GetFilePathForImportExport())
     cad.AddUndoably(points)
     
 def ExportPointFilePath(path):
+    if path.lower().endswith('.' + pointsfile.binary_extension):
+        # the binary format holds one set of curves, so write the first
+        doc = cad.GetApp()
+        object = doc.GetFirstChild()
+        while object:
+            if object.GetType() == points_type:
+                pointsfile.save_binary(path, object.points)
+                return
+            object = doc.GetNextChild()
+        return
+
     f = open(path, 'w')
 
     doc = cad.GetApp()
@@ -0,0 +1,71 @@
+import json
+import os
+
+import pygame
+
+# things game.py works out at startup, kept on disk so the next start can skip the work
+# the font file pygame.font.SysFont would find, which means pygame scanning the system's fonts,
+# and the sprites already scaled to the screen's pixels per metre
+# an entry is used only if what it was made from hasn't changed
+
+cache_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), '.asset_cache')
+index_path = os.path.join(cache_dir, 'index.json')
+
+index = None
+
+def load_index():
+    global index
+    if index is None:
+        try:
+            f = open(index_path, 'r')
+            index = json.load(f)
+            f.close()
+        except (OSError, ValueError):
+            index = {}
+    return index
+
+def save_index():
+    os.makedirs(cache_dir, exist_ok = True)
+    temp_path = index_path + '.tmp'
+    f = open(temp_path, 'w')
+    json.dump(index, f, indent = 1)
+    f.close()
+    os.replace(temp_path, index_path)
+
+def get_file_key(path):
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+def get_font(names, size):
+    # the same font as pygame.font.SysFont(names, size)
+    fonts = load_index().setdefault('fonts', {})
+    entry = fonts.get(names)
+    if entry is not None and (entry['path'] is None or os.path.exists(entry['path'])):
+        return pygame.font.Font(entry['path'], size)
+    # SysFont uses pygame's default font if none of names are found, so does match_font returning None
+    path = pygame.font.match_font(names)
+    fonts[names] = {'path':path}
+    save_index()
+    return pygame.font.Font(path, size)
+
+def get_scaled_image(path, scale):
+    # pygame.image.load(path) scaled by scale with pygame.transform.scale, as game.py did
+    images = load_index().setdefault('images', {})
+    key = os.path.basename(path) + ' ' + repr(scale)
+    source_key = get_file_key(path)
+    entry = images.get(key)
+    if entry is not None and entry['source'] == source_key:
+        try:
+            return pygame.image.load(os.path.join(cache_dir, entry['file']))
+        except (pygame.error, OSError):
+            pass
+    img = pygame.image.load(path)
+    img = pygame.transform.scale(img, (int(img.get_width()*scale), int(img.get_height()*scale)))
+    file_name = 'image_%d.png' % len(images)
+    if entry is not None:
+        file_name = entry['file']
+    os.makedirs(cache_dir, exist_ok = True)
+    pygame.image.save(img, os.path.join(cache_dir, file_name))
+    images[key] = {'source':source_key, 'file':file_name}
+    save_index()
+    return img
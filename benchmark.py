@@ -0,0 +1,143 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import pymunk
+
+import simulation
+
+# measures how fast the physics steps headless, and how fast game.py draws frames offscreen,
+# for each setup the game can run in, and compares the results with a saved baseline
+# each number is the best of a few repeats, as the slower runs are mostly other things on the machine
+
+default_baseline = 'benchmark_baseline.json'
+default_threshold = 0.1 # a result this fraction slower than the baseline is a regression
+
+physics_cases = [
+    # name, sim_mode, config settings
+    ('gliding slide joints', 'gliding', {'lines_use_slide_joints':True}),
+    ('gliding pin joints', 'gliding', {'lines_use_slide_joints':False}),
+    ('gliding winch', 'gliding', {'winch':True}),
+    ('flapping pin joints', 'flapping', {'lines_use_slide_joints':False}),
+    ('flapping slide joints', 'flapping', {'lines_use_slide_joints':True}),
+    ('flapping winch', 'flapping', {'winch':True}),
+    ]
+
+render_cases = [
+    # name, sim_mode, config settings, draw_forces
+    ('gliding', 'gliding', {}, False),
+    ('gliding draw_forces', 'gliding', {}, True),
+    ('flapping', 'flapping', {}, False),
+    ('flapping draw_forces', 'flapping', {}, True),
+    ('flapping winch', 'flapping', {'winch':True}, False),
+    ]
+
+def best_rate(function, count, repeats):
+    # count things per second done by function, best of repeats
+    best = None
+    for i in range(repeats):
+        start_time = time.perf_counter()
+        function()
+        seconds = time.perf_counter() - start_time
+        if best is None or seconds < best:
+            best = seconds
+    return count / best
+
+def measure_physics(sim_mode, settings, steps, repeats):
+    def run():
+        sim = simulation.Simulation(simulation.Config(sim_mode, **settings))
+        sim.step(steps)
+    return best_rate(run, steps, repeats)
+
+def measure_rendering(sim_mode, settings, draw_forces, frames, repeats):
+    # draws into the game's window with SDL's dummy video driver, so nothing is shown and vsync doesn't hold it back
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    import game
+    game.draw_forces = draw_forces
+    def run():
+        game.start_simulation(config = simulation.Config(sim_mode, **settings))
+        for i in range(frames):
+            game.sim.step(1)
+            game.draw_frame()
+            game.frame_profiler.end_frame()
+    return best_rate(run, frames, repeats)
+
+def run_benchmarks(steps = 20000, frames = 600, repeats = 3, rendering = True):
+    results = {}
+    for name, sim_mode, settings in physics_cases:
+        results['physics ' + name] = measure_physics(sim_mode, settings, steps, repeats)
+        print('%-40s %10.0f steps/s' % ('physics ' + name, results['physics ' + name]))
+    if rendering:
+        for name, sim_mode, settings, draw_forces in render_cases:
+            results['render ' + name] = measure_rendering(sim_mode, settings, draw_forces, frames, repeats)
+            print('%-40s %10.1f frames/s' % ('render ' + name, results['render ' + name]))
+    return {
+        'python':platform.python_version(),
+        'pymunk':pymunk.version,
+        'machine':platform.machine(),
+        'processor':platform.processor(),
+        'steps':steps,
+        'frames':frames,
+        'repeats':repeats,
+        'results':results,
+        }
+
+def compare(report, baseline, threshold = default_threshold):
+    # returns a list of (name, ratio) for the results slower than the baseline by more than threshold
+    regressions = []
+    for name, value in sorted(report['results'].items()):
+        base = baseline['results'].get(name)
+        if base is None:
+            print('%-40s no baseline' % name)
+            continue
+        ratio = value / base
+        flag = ''
+        if ratio < 1.0 - threshold:
+            flag = '  REGRESSION'
+            regressions.append((name, ratio))
+        print('%-40s %7.1f%% of baseline%s' % (name, 100.0 * ratio, flag))
+    return regressions
+
+def save_report(path, report):
+    f = open(path, 'w')
+    json.dump(report, f, indent = 1)
+    f.close()
+
+def load_report(path):
+    f = open(path, 'r')
+    report = json.load(f)
+    f.close()
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Measure physics steps/s and offscreen frames/s, and compare them with a baseline')
+    parser.add_argument('--steps', type = int, default = 20000, help = 'physics steps per run')
+    parser.add_argument('--frames', type = int, default = 600, help = 'frames drawn per run')
+    parser.add_argument('--repeats', type = int, default = 3)
+    parser.add_argument('--no-render', action = 'store_true', help = 'only measure the physics')
+    parser.add_argument('--output', help = 'write the results here as json')
+    parser.add_argument('--baseline', default = default_baseline, help = 'compare with these results, if the file exists')
+    parser.add_argument('--save-baseline', action = 'store_true', help = 'make these results the baseline')
+    parser.add_argument('--threshold', type = float, default = default_threshold, help = 'fraction slower than the baseline which counts as a regression')
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.steps, args.frames, args.repeats, not args.no_render)
+    if args.output:
+        save_report(args.output, report)
+    if args.save_baseline:
+        save_report(args.baseline, report)
+        print('saved baseline to ' + args.baseline)
+    elif os.path.exists(args.baseline):
+        baseline = load_report(args.baseline)
+        if baseline['pymunk'] != report['pymunk'] or baseline['python'] != report['python']:
+            print('baseline was made with python %s, pymunk %s' % (baseline['python'], baseline['pymunk']))
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print('%d regressions more than %.0f%% slower than the baseline' % (len(regressions), 100.0 * args.threshold))
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,461 @@
+import argparse
+import math
+import time
+
+import numpy
+
+import simulation
+import terrain
+
+# many wing and pilot systems stepped together as numpy arrays, one entry per glider
+# this copies what simulation.Simulation does with pymunk:
+#   the same lift, drag and brake model as Wing.apply_force
+#   the same front and rear lines, from (-1.3, 0) and (1.4, 0) on the wing
+#   the same step order as Chipmunk; move the bodies, set up the lines and ground contacts,
+#   add gravity and forces, then space.iterations rounds of impulses, reusing last step's impulses to start
+# it doesn't do the winch, thrust, a Damper, a line schedule or the collision between the wing and the pilot; pymunk does collide
+# them, so a glider whose wing and pilot polygons overlap is marked as not valid from the step they first touch,
+# as its state from then on isn't what pymunk's would be
+# with pin joint lines the flight is chaotic enough that rounding differences from pymunk, around 1e-9 m,
+# double every few hundred steps, so over thousands of steps one glider no longer follows pymunk's exactly
+# every glider can have its own line length curve, and the state arrays are public so they can be perturbed
+
+class BodyArrays:
+    def __init__(self, game_body, count):
+        body = game_body.body
+        self.m_inv = 1.0 / body.mass
+        self.i_inv = 1.0 / body.moment
+        self.cog = body.center_of_gravity
+        self.vertices = [(v.x, v.y) for v in game_body.shape.get_vertices()]
+        # vertices from the centre of gravity, as columns to go with the per glider rows
+        self.vertex_px = numpy.array([[v[0] - self.cog.x] for v in self.vertices])
+        self.vertex_py = numpy.array([[v[1] - self.cog.y] for v in self.vertices])
+        self.radius = math.sqrt((self.vertex_px ** 2 + self.vertex_py ** 2).max()) # of a circle about the centre of gravity holding the polygon
+        self.friction = game_body.shape.friction
+
+        c = body.local_to_world(self.cog)
+        self.x = numpy.full(count, c.x)
+        self.y = numpy.full(count, c.y)
+        self.angle = numpy.full(count, body.angle)
+        self.vx = numpy.full(count, body.velocity.x)
+        self.vy = numpy.full(count, body.velocity.y)
+        self.w = numpy.full(count, body.angular_velocity)
+        # bias velocities, used by the ground contacts to push bodies out of the ground
+        self.vbx = numpy.zeros(count)
+        self.vby = numpy.zeros(count)
+        self.wb = numpy.zeros(count)
+        self.fx = numpy.zeros(count)
+        self.fy = numpy.zeros(count)
+        self.t = numpy.zeros(count)
+        self.update_rotation()
+
+        # accumulated ground contact impulses, one per polygon vertex
+        self.contact_jn = [numpy.zeros(count) for v in self.vertices]
+        self.contact_jt = [numpy.zeros(count) for v in self.vertices]
+
+    def update_rotation(self):
+        self.cos = numpy.cos(self.angle)
+        self.sin = numpy.sin(self.angle)
+
+    def get_offset(self, local_pos):
+        # vector from centre of gravity to a point given in body coordinates
+        px = local_pos[0] - self.cog.x
+        py = local_pos[1] - self.cog.y
+        return self.cos * px - self.sin * py, self.sin * px + self.cos * py
+
+    def get_world_vertices(self, index):
+        # x and y of each polygon vertex for the gliders picked by index, one row per vertex
+        x = self.x[index]
+        y = self.y[index]
+        cos = self.cos[index]
+        sin = self.sin[index]
+        return x + cos * self.vertex_px - sin * self.vertex_py, y + sin * self.vertex_px + cos * self.vertex_py
+
+    def get_position(self):
+        # the body's origin, what pymunk's body.position gives
+        rx, ry = self.get_offset((0.0, 0.0))
+        return self.x + rx, self.y + ry
+
+    def apply_force_at_offset(self, rx, ry, fx, fy):
+        self.fx += fx
+        self.fy += fy
+        self.t += rx * fy - ry * fx
+
+    def apply_impulse(self, rx, ry, jx, jy):
+        self.vx += jx * self.m_inv
+        self.vy += jy * self.m_inv
+        self.w += self.i_inv * (rx * jy - ry * jx)
+
+    def apply_bias_impulse(self, rx, ry, jx, jy):
+        self.vbx += jx * self.m_inv
+        self.vby += jy * self.m_inv
+        self.wb += self.i_inv * (rx * jy - ry * jx)
+
+    def integrate_position(self, dt):
+        self.x += (self.vx + self.vbx) * dt
+        self.y += (self.vy + self.vby) * dt
+        self.angle += (self.w + self.wb) * dt
+        self.vbx[:] = 0.0
+        self.vby[:] = 0.0
+        self.wb[:] = 0.0
+        self.update_rotation()
+
+    def integrate_velocity(self, gravity, dt):
+        self.vx += (gravity[0] + self.fx * self.m_inv) * dt
+        self.vy += (gravity[1] + self.fy * self.m_inv) * dt
+        self.w += self.t * self.i_inv * dt
+        self.fx[:] = 0.0
+        self.fy[:] = 0.0
+        self.t[:] = 0.0
+
+def polygons_overlap(a, b):
+    # for each glider, whether the convex polygons of bodies a and b overlap; they don't if the edge of either
+    # has the other entirely on its outside
+    # only the gliders with the bodies' bounding circles overlapping are looked at, usually none of them
+    dx = b.x - a.x
+    dy = b.y - a.y
+    overlap = dx * dx + dy * dy < (a.radius + b.radius) ** 2
+    near = numpy.flatnonzero(overlap)
+    if len(near) == 0:
+        return overlap
+    ax, ay = a.get_world_vertices(near)
+    bx, by = b.get_world_vertices(near)
+    separated = numpy.zeros(len(near), dtype = bool)
+    for xs, ys in ((ax, ay), (bx, by)):
+        for i in range(len(xs)):
+            # at right angles to the edge, either way round does
+            nx = ys[i] - ys[i-1]
+            ny = xs[i-1] - xs[i]
+            pa = ax * nx + ay * ny
+            pb = bx * nx + by * ny
+            separated |= (pa.max(axis = 0) < pb.min(axis = 0)) | (pb.max(axis = 0) < pa.min(axis = 0))
+    overlap[near] = ~separated
+    return overlap
+
+class GroundContacts:
+    # contacts between one body's polygon vertices and the flat ground, which is static
+    def __init__(self, body, ground_top, ground_friction):
+        self.body = body
+        self.ground_top = ground_top
+        self.friction = body.friction * ground_friction
+        self.active = []
+
+    def pre_step(self, dt, slop, bias_coef):
+        b = self.body
+        self.active = []
+        for k in range(len(b.vertices)):
+            rx, ry = b.get_offset(b.vertices[k])
+            dist = b.y + ry - self.ground_top
+            touching = dist < 0.0
+            if not touching.any():
+                b.contact_jn[k][:] = 0.0
+                b.contact_jt[k][:] = 0.0
+                continue
+            # contacts which have just started have no impulse to reuse
+            b.contact_jn[k] = numpy.where(touching, b.contact_jn[k], 0.0)
+            b.contact_jt[k] = numpy.where(touching, b.contact_jt[k], 0.0)
+            n_mass = numpy.where(touching, 1.0 / (b.m_inv + b.i_inv * rx * rx), 0.0)
+            t_mass = numpy.where(touching, 1.0 / (b.m_inv + b.i_inv * ry * ry), 0.0)
+            bias = -bias_coef * numpy.minimum(0.0, dist + slop) / dt
+            self.active.append([k, rx, ry, n_mass, t_mass, bias, numpy.zeros(len(dist))])
+
+    def apply_cached_impulse(self, dt_coef):
+        b = self.body
+        for k, rx, ry, n_mass, t_mass, bias, j_bias in self.active:
+            b.apply_impulse(rx, ry, b.contact_jt[k] * dt_coef, b.contact_jn[k] * dt_coef)
+
+    def apply_impulse(self):
+        b = self.body
+        for contact in self.active:
+            k, rx, ry, n_mass, t_mass, bias, j_bias = contact
+            # normal is straight up, tangent is along the ground
+            vbn = b.vby + b.wb * rx
+            jbn = (bias - vbn) * n_mass
+            j_bias_new = numpy.maximum(j_bias + jbn, 0.0)
+            contact[6] = j_bias_new
+
+            vrn = b.vy + b.w * rx
+            vrt = b.vx - b.w * ry
+            jn_old = b.contact_jn[k]
+            jn_acc = numpy.maximum(jn_old - vrn * n_mass, 0.0)
+            jt_max = self.friction * jn_acc
+            jt_old = b.contact_jt[k]
+            jt_acc = numpy.clip(jt_old - vrt * t_mass, -jt_max, jt_max)
+            b.contact_jn[k] = jn_acc
+            b.contact_jt[k] = jt_acc
+
+            b.apply_bias_impulse(rx, ry, 0.0, j_bias_new - j_bias)
+            b.apply_impulse(rx, ry, jt_acc - jt_old, jn_acc - jn_old)
+
+class LineArrays:
+    # a PinJoint, or a SlideJoint with only a maximum active, between points on two bodies
+    def __init__(self, a, b, anchor_a, anchor_b, lengths, slide, min_length, error_bias):
+        self.a = a
+        self.b = b
+        self.anchor_a = anchor_a
+        self.anchor_b = anchor_b
+        self.lengths = lengths
+        self.slide = slide
+        self.min_length = min_length
+        self.error_bias = error_bias
+        self.jn_acc = numpy.zeros(len(lengths))
+
+    def pre_step(self, dt):
+        a = self.a
+        b = self.b
+        self.r1x, self.r1y = a.get_offset(self.anchor_a)
+        self.r2x, self.r2y = b.get_offset(self.anchor_b)
+        dx = (b.x + self.r2x) - (a.x + self.r1x)
+        dy = (b.y + self.r2y) - (a.y + self.r1y)
+        dist = numpy.sqrt(dx * dx + dy * dy)
+        if self.slide:
+            inv = 1.0 / (dist + numpy.finfo(float).tiny)
+            too_long = dist > self.lengths
+            too_short = dist < self.min_length
+            sign = numpy.where(too_long, 1.0, numpy.where(too_short, -1.0, 0.0))
+            self.nx = dx * inv * sign
+            self.ny = dy * inv * sign
+            error = numpy.where(too_long, dist - self.lengths, numpy.where(too_short, self.min_length - dist, 0.0))
+            self.jn_acc = numpy.where(sign == 0.0, 0.0, self.jn_acc)
+        else:
+            inv = 1.0 / numpy.where(dist == 0.0, numpy.inf, dist)
+            self.nx = dx * inv
+            self.ny = dy * inv
+            error = dist - self.lengths
+        cross1 = self.r1x * self.ny - self.r1y * self.nx
+        cross2 = self.r2x * self.ny - self.r2y * self.nx
+        k = a.m_inv + b.m_inv + a.i_inv * cross1 * cross1 + b.i_inv * cross2 * cross2
+        self.n_mass = 1.0 / k
+        self.bias = -(1.0 - math.pow(self.error_bias, dt)) * error / dt
+
+    def apply_impulses(self, jn):
+        jx = self.nx * jn
+        jy = self.ny * jn
+        self.a.apply_impulse(self.r1x, self.r1y, -jx, -jy)
+        self.b.apply_impulse(self.r2x, self.r2y, jx, jy)
+
+    def apply_cached_impulse(self, dt_coef):
+        self.apply_impulses(self.jn_acc * dt_coef)
+
+    def apply_impulse(self):
+        a = self.a
+        b = self.b
+        rvx = (b.vx - b.w * self.r2y) - (a.vx - a.w * self.r1y)
+        rvy = (b.vy + b.w * self.r2x) - (a.vy + a.w * self.r1x)
+        vrn = rvx * self.nx + rvy * self.ny
+        jn = (self.bias - vrn) * self.n_mass
+        jn_old = self.jn_acc
+        if self.slide:
+            self.jn_acc = numpy.minimum(jn_old + jn, 0.0)
+        else:
+            self.jn_acc = jn_old + jn
+        self.apply_impulses(self.jn_acc - jn_old)
+
+class Ensemble:
+    def __init__(self, config = None, count = 1, line_wave_lengths = None):
+        # line_wave_lengths is one curve for all, or a list of count curves, each a list of (front, rear)
+        if config is None:
+            config = simulation.Config()
+        if config.winch:
+            raise ValueError('the ensemble does not do the winch')
+
+        # a pymunk simulation gives the starting state, masses, moments and solver settings
+        template = simulation.Simulation(config)
+        if template.line_schedule is not None:
+            raise ValueError('the ensemble does not do line schedules, only per step line length curves')
+        self.config = config
+        self.count = count
+        self.dt = config.dt
+        self.gravity = tuple(template.space.gravity)
+        self.iterations = template.space.iterations
+        self.collision_slop = template.space.collision_slop
+        self.collision_bias = template.space.collision_bias
+        self.line_wave = config.line_wave
+        self.line_wave_time = config.start_frame
+        self.steps = 0
+        self.prev_dt = 0.0
+
+        if line_wave_lengths is None:
+            line_wave_lengths = template.line_wave_lengths
+        lengths = numpy.asarray(line_wave_lengths, dtype = float)
+        if lengths.ndim == 2:
+            lengths = numpy.broadcast_to(lengths, (count,) + lengths.shape)
+        if lengths.shape[0] != count:
+            raise ValueError('need one line length curve per glider')
+        if config.line_wave_cycle_length > lengths.shape[1]:
+            raise ValueError('line_wave_cycle_length is longer than the line length curve')
+        self.line_wave_lengths = lengths
+
+        wing = template.wing
+        self.lift_coefficients = wing.lift_coefficients
+        self.drag_coefficients = wing.drag_coefficients
+        self.pressure_posns = wing.pressure_posns
+        self.brake = numpy.zeros(count, dtype = bool)
+        self.let_up = numpy.zeros(count, dtype = bool)
+
+        self.wing = BodyArrays(template.wing, count)
+        self.pilot = BodyArrays(template.pilot, count)
+
+        # the ground is flat segments with a radius of 0.05, which go on forever here
+        if not template.terrain.ground.is_flat():
+            raise ValueError('ensemble only flies over flat ground')
+        ground_top = template.terrain.get_height(0.0) + terrain.ground_radius
+        self.contacts = [GroundContacts(self.pilot, ground_top, terrain.ground_friction), GroundContacts(self.wing, ground_top, terrain.ground_friction)]
+
+        slide = config.lines_use_slide_joints
+        front_length = numpy.array(lengths[:, config.start_frame, 0])
+        rear_length = numpy.array(lengths[:, config.start_frame, 1])
+        line = template.front_line
+        self.front_line = LineArrays(self.wing, self.pilot, tuple(line.anchor_a), tuple(line.anchor_b), front_length, slide, line.min if slide else 0.0, line.error_bias)
+        line = template.rear_line
+        self.rear_line = LineArrays(self.wing, self.pilot, tuple(line.anchor_a), tuple(line.anchor_b), rear_length, slide, line.min if slide else 0.0, line.error_bias)
+
+        self.angle_of_attack = numpy.zeros(count)
+        self.lift = numpy.zeros(count)
+        self.drag = numpy.zeros(count)
+        # False once a glider's wing has touched its pilot, where pymunk would have collided them
+        self.valid = numpy.ones(count, dtype = bool)
+        self.contact_step = numpy.full(count, -1) # the step it first touched, -1 if it hasn't
+
+    def apply_wing_force(self):
+        config = self.config
+        wing = self.wing
+        angle_of_wing = wing.angle - 3.1
+        angle_of_wing = numpy.where(self.brake, angle_of_wing - config.brake_angle, numpy.where(self.let_up, angle_of_wing + config.brake_angle, angle_of_wing))
+
+        v_magn = numpy.sqrt(wing.vx ** 2 + wing.vy ** 2)
+        safe_magn = numpy.where(v_magn != 0.0, v_magn, 1.0)
+        nvx = numpy.where(v_magn != 0.0, wing.vx / safe_magn, 0.0)
+        nvy = numpy.where(v_magn != 0.0, wing.vy / safe_magn, 0.0)
+        angle_of_attack = (numpy.arctan2(nvy, nvx) - angle_of_wing) * 57
+        angle_of_attack = numpy.where(angle_of_attack > 180, angle_of_attack - 360, numpy.where(angle_of_attack < -180, angle_of_attack + 360, angle_of_attack))
+        self.angle_of_attack = angle_of_attack
+
+        # assuming lift is about 1000Nm ( 100kg ) at 10 m/s
+        lift = 16.0 * v_magn * v_magn * self.lift_coefficients.get_y_at_x_array(angle_of_attack)
+        drag = 16.0 * v_magn * v_magn * (self.drag_coefficients.get_y_at_x_array(angle_of_attack) * 1.1)
+        if config.lines_use_slide_joints:
+            lift = numpy.clip(lift, -4000, 4000)
+            drag = numpy.minimum(drag, 4000)
+        self.lift = lift
+        self.drag = drag
+
+        # lift is at right angles to the airflow, drag is against it, both act at the wing's origin
+        fx = nvy * lift - nvx * drag
+        fy = -nvx * lift - nvy * drag
+        rx, ry = wing.get_offset((0.0, 0.0))
+        wing.apply_force_at_offset(rx, ry, fx, fy)
+
+        if self.line_wave:
+            self.front_line.lengths = self.line_wave_lengths[:, self.line_wave_time, 0]
+            self.rear_line.lengths = self.line_wave_lengths[:, self.line_wave_time, 1]
+            self.line_wave_time += 1
+            if self.line_wave_time >= config.line_wave_cycle_length:
+                self.line_wave_time = 0
+
+    def step(self, n = 1):
+        dt = self.dt
+        bodies = [self.wing, self.pilot]
+        lines = [self.front_line, self.rear_line]
+        bias_coef = 1.0 - math.pow(self.collision_bias, dt)
+        for i in range(n):
+            self.apply_wing_force()
+
+            for body in bodies:
+                body.integrate_position(dt)
+            touching = polygons_overlap(self.wing, self.pilot) & self.valid
+            if touching.any():
+                self.valid &= ~touching
+                self.contact_step[touching] = self.steps + i + 1
+            for contacts in self.contacts:
+                contacts.pre_step(dt, self.collision_slop, bias_coef)
+            for line in lines:
+                line.pre_step(dt)
+            for body in bodies:
+                body.integrate_velocity(self.gravity, dt)
+
+            dt_coef = 0.0 if self.prev_dt == 0.0 else dt / self.prev_dt
+            for contacts in self.contacts:
+                contacts.apply_cached_impulse(dt_coef)
+            for line in lines:
+                line.apply_cached_impulse(dt_coef)
+
+            for iteration in range(self.iterations):
+                for contacts in self.contacts:
+                    contacts.apply_impulse()
+                for line in lines:
+                    line.apply_impulse()
+            self.prev_dt = dt
+        self.steps += n
+
+    def get_height(self):
+        return self.pilot.get_position()[1]
+
+    def get_distance(self):
+        return numpy.fabs(self.pilot.get_position()[0])
+
+    def get_airspeed(self):
+        return numpy.sqrt(self.wing.vx ** 2 + self.wing.vy ** 2)
+
+def check_accuracy(config = None, steps = 600):
+    # runs one glider with pymunk and with the ensemble, returns the largest difference in pilot and wing positions
+    # up to the step the wing first touches the pilot, and that step, or None if it doesn't in steps
+    if config is None:
+        config = simulation.Config()
+    sim = simulation.Simulation(config)
+    ensemble = Ensemble(config, 1)
+    pilot_error = 0.0
+    wing_error = 0.0
+    for i in range(steps):
+        sim.step()
+        ensemble.step()
+        if not ensemble.valid[0]:
+            return pilot_error, wing_error, int(ensemble.contact_step[0])
+        for body, arrays, error in ((sim.pilot.body, ensemble.pilot, 'pilot'), (sim.wing.body, ensemble.wing, 'wing')):
+            x, y = arrays.get_position()
+            d = math.hypot(body.position.x - x[0], body.position.y - y[0])
+            if error == 'pilot':
+                pilot_error = max(pilot_error, d)
+            else:
+                wing_error = max(wing_error, d)
+    return pilot_error, wing_error, None
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Step many gliders at once with numpy')
+    parser.add_argument('--mode', choices = ['gliding', 'flapping'], default = 'flapping')
+    parser.add_argument('--slide-joints', action = 'store_true', help = 'lines as slide joints, as gliding has them, for the gliders stepped')
+    parser.add_argument('--count', type = int, default = 1000)
+    parser.add_argument('--steps', type = int, default = 600)
+    parser.add_argument('--check-steps', type = int, default = 600, help = 'steps to compare against pymunk for one glider')
+    args = parser.parse_args()
+
+    config = simulation.Config(args.mode)
+    if args.slide_joints:
+        config.lines_use_slide_joints = True
+    # both kinds of line are checked, as the ensemble copies the solver separately for each
+    for lines_use_slide_joints in (False, True):
+        check_config = simulation.Config(args.mode, lines_use_slide_joints = lines_use_slide_joints)
+        pilot_error, wing_error, contact_step = check_accuracy(check_config, args.check_steps)
+        lines = 'slide joint' if lines_use_slide_joints else 'pin joint'
+        if contact_step is None:
+            print('%s lines, accuracy against pymunk over %d steps: pilot within %.2e m, wing within %.2e m' % (lines, args.check_steps, pilot_error, wing_error))
+        else:
+            print('%s lines, accuracy against pymunk up to step %d, where the wing touches the pilot: pilot within %.2e m, wing within %.2e m' % (lines, contact_step, pilot_error, wing_error))
+
+    ensemble = Ensemble(config, args.count)
+    start_time = time.perf_counter()
+    ensemble.step(args.steps)
+    seconds = time.perf_counter() - start_time
+    print('%d gliders x %d steps in %.2f s, %.0f glider steps per second' % (args.count, args.steps, seconds, args.count * args.steps / seconds))
+    invalid = numpy.count_nonzero(~ensemble.valid)
+    if invalid > 0:
+        print('%d gliders not valid after their wing touched the pilot, first at step %d' % (invalid, ensemble.contact_step[~ensemble.valid].min()))
+
+    sim = simulation.Simulation(config)
+    start_time = time.perf_counter()
+    sim.step(args.steps)
+    seconds = time.perf_counter() - start_time
+    print('pymunk: %.0f steps per second' % (args.steps / seconds))
+
+if __name__ == '__main__':
+    main()
@@ -1,546 +1,526 @@
-import math
-import pygame
-
-import pymunk
-import pymunk.pygame_util
-from pymunk.vec2d import Vec2d
-
-pygame.init()
-screen = pygame.display.set_mode((1200, 600))
-clock = pygame.time.Clock()
-running = True
-space = pymunk.Space()
-pixel_scale = 20.0 # pixels per metre
-space.gravity = (0.0, -9.8)
-pymunk.pygame_util.positive_y_is_up = True
-draw_options = pymunk.pygame_util.DrawOptions(screen)
-font_height = 30
-myfont = pygame.font.SysFont('Arial', font_height)
-image_pixel_scale = 63.0 # there are about 63 pixels per metre in the pictures I have
-image_scale = pixel_scale / image_pixel_scale
-
-pilotImg = pygame.image.load('pilot.png')
-wingImg = pygame.image.load('wing.png')
-
-pilotImg = pygame.transform.scale(pilotImg, (int(pilotImg.get_width()*image_scale), int(pilotImg.get_height()*image_scale)))
-wingImg = pygame.transform.scale(wingImg, (int(wingImg.get_width()*image_scale), int(wingImg.get_height()*image_scale)))
-
-pilot_centre = Vec2d(49,64) * image_scale
-thrust = False
-thrust_on_wing = False
-wing_centre = Vec2d(93,56) * image_scale
-
-w = screen.get_width()
-h = screen.get_height()
-draw_forces = False
-force_draw_factor = 0.003
-background_spacing = 10 # metres
-camera = None
-text_y = 0
-winch_length = 10.0 # used if winch
-winch = False
-winch_does_up_down = True
-start_frame = 106
-line_wave_time = start_frame
-fast_forward = 1
-
-sim_mode = 'gliding'
-sim_mode = 'flapping'
-
-if sim_mode == 'gliding':
-    start_height = 20
-    line_wave = False
-    brake_angle = 0.2
-    start_v = (-7,0.0)
-    lines_use_slide_joints = True
-    pilot_runs = False
-else: # flapping
-    start_height = 0.3
-    line_wave = True
-    line_wave_cycle_length = 251
-    brake_angle = 0.2
-    start_v = (-11,0.0)
-    lines_use_slide_joints = False
-    pilot_runs = True
-
-
-class Graph:
-    def __init__(self, pts):
-        # make sure pts is a list of (x,y) points always increasing in x
-        self.pts = pts
-        
-    def get_y_at_x(self, x):
-        y = None
-        prev_p = None
-        for pt in self.pts:
-            y = pt[1]
-            if x < pt[0]:
-                if prev_p:
-                    y = prev_p[1] + (x-prev_p[0])/(pt[0]-prev_p[0])*(pt[1]-prev_p[1])
-                break
-            prev_p = pt
-        return y
-    
-class GameBody():
-    def __init__(self, pos, v, mass, poly_pts):
-        self.body = pymunk.Body()
-        self.body.position = pos
-        self.body.velocity = v
-        self.shape = pymunk.Poly(self.body, poly_pts)
-        self.shape.mass = mass
-        self.shape.friction = 0.7
-        space.add(self.body, self.shape)
-
-    def draw_vector(self, pos, v, colour = (0,0,0)):
-        wpos = self.body.local_to_world(Vec2d(pos[0], pos[1]))
-        pygame.draw.line(screen, colour, world_to_screen(wpos), world_to_screen(wpos + v * force_draw_factor))
-
-    def apply_parasitic_drag(self, coefficient):
-        v, v_magn = self.body.velocity.normalized_and_length()
-        drag = 1.0 * v_magn * v_magn * coefficient
-        world_pos = self.body.local_to_world((0,0))
-        self.body.apply_force_at_world_point(-v * drag, world_pos)
-        
-    def draw_shape(self):
-        s = None
-        prev = None
-        for v in self.shape.get_vertices():
-            x,y = v.rotated(self.shape.body.angle) + self.shape.body.position
-            if s == None:
-                s = (x,y)
-            else:
-                p = (x,y)
-                if prev != None:
-                    draw_line(prev, p)
-                prev = (x,y)
-        if prev != None:
-            draw_line(prev, s)
-
-class Wing(GameBody):
-    def __init__(self, alt):
-        poly_pts = [(0.635, -2.667),(-0.048, -2.556),(-0.841, -1.619),(-1.317, 0.698),(-0.984, 0.841),(1.349, 0.254),(1.016, -1.381)]
-        GameBody.__init__(self, (0,alt),start_v, 4, poly_pts)
-        self.body.angle = 0.3
-        self.airflow = Vec2d(0,0)
-        self.lift = Vec2d(0,0)
-        self.drag = Vec2d(0,0)
-        self.pressure_pos = 0
-        self.lift_coefficients = Graph([(-100, 0), (-30, -0.5), (-10, -0.5), (-8, -0.4), (-6, -0.2), (-4, 0), (-2, 0.2), (0, 0.42), (2, 0.66), (4, 0.82), (6, 1.1), (8, 1.2), (10, 1.4), (12, 1.45), (14, 1.52), (16, 1.5), (18, 1.45), (30, 1.4), (100, 0)])
-        self.drag_coefficients = Graph([(-30,0.3),(-10, 0.1), (0, 0.07), (8, 0.1), (12, 0.14), (15, 0.25), (18, 0.45)])
-        self.pressure_posns = Graph([(-10, 0), (0, 0.0)])
-        self.angle_of_attack = None       
-        self.angle_of_wing = None 
-        self.brake = False
-        self.let_up = False
-        # list of (front line length, rear line legnth)
-        self.line_wave_lengths = eval( open("line_lengths.points", "r").read() )
-        
-    def get_lift_coefficient(self, angle):
-        return self.lift_coefficients.get_y_at_x(angle)
-        
-    def get_drag_coefficient(self, angle):
-        return self.drag_coefficients.get_y_at_x(angle) * 1.1
-        
-    def get_pressure_pos(self, angle):
-        return self.pressure_posns.get_y_at_x(angle)
-        
-    def get_front_length(self, frame):
-        return self.line_wave_lengths[frame][0]   
-        
-    def get_rear_length(self, frame):
-        return self.line_wave_lengths[frame][1]   
-        
-    def draw(self):
-        draw_image(wingImg, wing_centre, self.body)
-        
-        #self.draw_shape()
-        
-        if draw_forces:
-            # draw lift and drag
-            self.draw_vector((self.pressure_pos, 0), self.lift, (0,0,255))
-            self.draw_vector((self.pressure_pos, 0), self.drag, (255,0,0))
-            self.draw_vector((0,0), Vec2d(1,0).rotated(self.angle_of_wing) * 500, (255,255,0))
-            self.draw_vector((0,0), self.body.velocity * 300)
-            self.draw_vector((0,0), self.body.velocity * (-300))
-        
-    def apply_force(self):
-        self.angle_of_wing = self.body.angle - 3.1
-        if self.brake:    
-            self.angle_of_wing -= brake_angle
-        elif self.let_up:
-            self.angle_of_wing += brake_angle
-
-        v, v_magn = self.body.velocity.normalized_and_length()
-        angle_of_airflow = math.atan2(v.y, v.x)
-        self.angle_of_attack = (angle_of_airflow - self.angle_of_wing) * 57
-        if self.angle_of_attack > 180: self.angle_of_attack -= 360
-        elif self.angle_of_attack < -180: self.angle_of_attack += 360
-        
-        # assuming lift is about 1000Nm ( 100kg ) at 10 m/s
-        lift = 16.0 * v_magn * v_magn * self.get_lift_coefficient(self.angle_of_attack)
-        drag = 16.0 * v_magn * v_magn * self.get_drag_coefficient(self.angle_of_attack)
-        
-        if lines_use_slide_joints:
-            if lift < -4000:
-                lift = -4000
-            if lift > 4000:
-                lift = 4000
-            if drag > 4000:
-                drag = 4000
-            
-        self.lift = -v.perpendicular() * lift
-        self.drag = -v * drag
-        
-        self.pressure_pos = self.get_pressure_pos(self.angle_of_attack)
-        
-        world_pos = self.body.local_to_world((0,0))
-        self.body.apply_force_at_world_point(self.lift + self.drag, world_pos)
-
-        if thrust_on_wing:
-            # 20 kg to the left
-            world_pos = self.body.local_to_world((0,0))
-            self.body.apply_force_at_world_point(Vec2d(-20 * 9.8, 0), world_pos)
-            
-        if line_wave:
-            # up and down
-            global line_wave_time
-            global line_wave_cycle_length
-            
-            front_length, rear_length = self.line_wave_lengths[line_wave_time]
-
-            if rear_line != None:
-                if lines_use_slide_joints:
-                    rear_line.max = rear_length
-                else:
-                    rear_line.distance = rear_length
-            if front_line != None:
-                if lines_use_slide_joints:
-                    front_line.max = front_length
-                else:
-                    front_line.distance = front_length
-
-            line_wave_time += 1
-            if line_wave_time >= line_wave_cycle_length:
-                line_wave_time = 0
-        
-class Centre(GameBody):
-    def __init__(self, alt):
-        poly_pts = [(-0.005, -0.005), (-0.005, 0.005), (0.005, 0.005), (0.005, -0.005)]
-        GameBody.__init__(self, (0,alt), start_v, 3, poly_pts)
-        
-    def draw(self):
-        self.draw_shape()
-        
-    def apply_force(self):
-        if thrust:
-            # 20 kg to the left
-            world_pos = self.body.local_to_world((0,0))
-            #self.body.apply_force_at_world_point(Vec2d(-20 * 9.8, 0), world_pos)
-        self.apply_parasitic_drag(0.1)
-        
-class Damper(GameBody):
-    def __init__(self, wing, pos_on_wing):
-        self.wing = wing
-        world_pos = wing.body.local_to_world(pos_on_wing)
-        poly_pts = [(-0.05, -0.05), (-0.05, 0.05), (0.05, 0.05), (0.05, -0.05)]
-        GameBody.__init__(self, world_pos + (0, -0.3), start_v, 0.5, poly_pts)
-        self.damped_spring = pymunk.DampedSpring(wing.body, self.body, pos_on_wing, (0, 0), 0.3, 500, 0.3)
-        space.add(self.damped_spring)
-        
-    def draw(self):
-        draw_shape(self)
-
-class Pilot(GameBody):
-    def __init__(self, starting_height):
-        poly_pts = [(0.302, 0.619),(-0.556, -0.0317),(-0.603, -0.714),(0.063, -0.460),(0.429, 0.222)]
-        GameBody.__init__(self, (0,starting_height), start_v, 85, poly_pts)
-        self.winch_up = False
-        self.v_to_centre = None
-        self.dline = 0.0
-        if pilot_runs:      
-            self.shape.friction = 0.0
-        
-    def draw(self):
-        #self.draw_shape()
-        draw_image(pilotImg, pilot_centre, self.body)
-        if self.v_to_centre != None:
-            self.draw_vector((-0.1, 0.2), self.v_to_centre * 100, (150,0,0))
-        
-    def apply_force(self):
-        if thrust:
-            # 20 kg to the left
-            world_pos = self.body.local_to_world((0,0))
-            self.body.apply_force_at_world_point(Vec2d(-20 * 9.8, 0), world_pos)
-
-        # winch
-#        if drop_line != None:
-#            if self.winch_up:
-#                self.dline -= 0.002
-#                if self.dline < -0.4:
-#                    self.dline = -0.4
-#            else:
-#                self.dline += 0.002
-#                if self.dline > 0.4:
-#                    self.dline = 0.4
-#            drop_line.max += self.dline
-#            if drop_line.max < 0.5:
-#                drop_line.max = 0.5
-#                self.dline = 0
-#            if drop_line.max > winch_length:
-#                drop_line.max = winch_length
-#                self.dline = 0
-        
-        #self.apply_parasitic_drag(0.1)
-            
-    
-def draw_line(s,e,col=(0,0,0)):
-    pygame.draw.line(screen, col, world_to_screen(Vec2d(s[0], s[1])), world_to_screen(Vec2d(e[0], e[1])))
-    
-def draw_rect(minxy, maxxy, col=(0,0,0)):
-    sminxy = world_to_screen(minxy)
-    smaxxy = world_to_screen(maxxy)
-    pygame.draw.rect(screen, col, pygame.Rect(sminxy.x, smaxxy.y, smaxxy.x - sminxy.x, sminxy.y - smaxxy.y))
-    
-def draw_text(s, col=(0,0,0)):
-    global text_y
-    screen.blit(myfont.render(s, False, col),(0,text_y))
-    text_y += font_height * 1.2
-
-def draw_background():
-    # find min point
-    minxy = Vec2d(0,h)
-    maxxy = Vec2d(w,0)
-    wmin = screen_to_world(minxy)
-    wmax = screen_to_world(maxxy)
-    space = background_spacing
-    minx = int(wmin.x/space - 1) * space
-    miny = int(wmin.y/space - 1) * space
-    miny_above_ground = miny
-    draw_ground = False
-    if miny_above_ground < 0:
-        miny_above_ground = 0
-        draw_ground = True        
-    maxx = int(wmax.x/space + 1) * space
-    maxy = int(wmax.y/space + 1) * space
-    
-    x = minx
-    while x < maxx:
-        draw_line((x, miny_above_ground), (x, maxy), (128,128,128))
-        x += space
-    
-    y = miny_above_ground
-    while y < maxy:
-        draw_line((minx, y), (maxx, y), (128,128,128))
-        y += space
-        
-    if draw_ground:
-        draw_rect(Vec2d(minx, miny), Vec2d(maxx, 0), (35,100,40))    
-        
-    if line_wave:
-        if front_line != None:
-            if lines_use_slide_joints:
-                line_h = front_line.max * 30
-            else:
-                line_h = front_line.distance * 30
-            pygame.draw.rect(screen, (0,255,0), pygame.Rect(0.8 * w, h - 100 - line_h, 10, line_h))
-        if rear_line != None:
-            if lines_use_slide_joints:
-                line_h = rear_line.max * 30
-            else:
-                line_h = rear_line.distance * 30
-            pygame.draw.rect(screen, (255,0,0), pygame.Rect(0.8 * w + 20, h - 100 - line_h, 10, line_h))
-
-    draw_text(sim_mode) # gliding for example
-
-    if wing.angle_of_attack != None:
-        draw_text('Angle of attack = ' + ('%.1f' % wing.angle_of_attack) + ' degrees')
-    
-    draw_text('Height = ' + '%.1f' %(pilot.body.position.y) + 'm')
-    draw_text('Airspeed = ' + '%.1f' % abs(wing.body.velocity) + 'm/s')
-    draw_text('Distance = ' + '%.1f' % math.fabs(pilot.body.position.x) + 'm')
-    draw_text('Normal Speed' if (fast_forward == 1) else ('>> x' + str(fast_forward)))
-    #draw_text('Frame: ' + str(int(line_wave_time)) + ' of ' + str(line_wave_cycle_length))
-
-def add_wall(space, start, end):
-    seg = pymunk.Segment(space.static_body, start, end, 0.05)
-    seg.friction = 1
-    seg.elasticity = 1
-    space.add(seg)
-    
-def y_flipped(pos):
-    return Vec2d(pos.x, h-pos.y)
-    
-def camera_adjusted(pos):
-    new_pos = (pos - camera) * pixel_scale + Vec2d(w * 0.5, h * 0.5)
-    return new_pos
-
-def world_to_screen(pos):
-    return y_flipped(camera_adjusted(pos))
-    
-def screen_to_world(pos):
-    new_pos = y_flipped(pos)
-    return (new_pos - Vec2d(w * 0.5, h * 0.5))/pixel_scale + camera
-    
-def draw_image(img, centre, body):
-    # centre is in pixels
-    rect = img.get_rect()
-    rect_center_to_img_center = Vec2d(centre.x - rect.centerx, rect.centery - centre.y)
-    if body.angle > 1000:
-        return
-    if body.angle < -1000:
-        return
-    rot_img = pygame.transform.rotate(img, body.angle * 57)
-    rect_center_to_img_center = rect_center_to_img_center.rotated(body.angle)
-    rot_rect = rot_img.get_rect()
-    v_centre = Vec2d(rot_rect.centerx, rot_rect.centery)
-    rot_pos = rect_center_to_img_center + v_centre
-    screen.blit(rot_img, world_to_screen(body.position) + Vec2d(-rot_pos.x, rot_pos.y - rot_rect.h))
-    
-def get_rope_vector(rope):
-    return rope.a.local_to_world(rope.anchor_a) - rope.b.local_to_world(rope.anchor_b)
-
-def draw_rope(rope):
-    # draw a slide joint
-    if rope == None:
-        return
-    
-    draw_line(rope.a.local_to_world(rope.anchor_a), rope.b.local_to_world(rope.anchor_b), (128, 128, 160))
-    
-def update_camera_pos():
-    global camera
-    camera = pilot.body.position + (0,5)
-
-# container
-add_wall(space, (-20000, 0), (20000, 0))
-
-
-drop_line = None
-if winch:
-    wing = Wing(start_height + 6 + winch_length * 2)
-    centre = Centre(start_height + winch_length * 2)
-    pilot = Pilot(start_height-0.2 + winch_length)
-    line_attacher = centre
-    if lines_use_slide_joints:
-        drop_line = pymunk.SlideJoint(centre.body, pilot.body, (0, 0), (0.0, 0.2), 0.01, winch_length)
-    else:
-        drop_line = pymunk.PinJoint(centre.body, pilot.body, (0, 0), (0.0, 0.2))
-        #drop_line.distance = winch_length
-    space.add(drop_line)
-    attacher_point = (0.0, 0.0)
-else:
-    wing = Wing(start_height + 6)
-    pilot = Pilot(start_height-0.2)
-    line_attacher = pilot
-    attacher_point = (0.0, 0.2)
- 
-#damper_front = Damper(wing, (-1.3, 0))
-#damper_rear = Damper(wing, (1.4, 0))
-
-front_length, rear_length = wing.line_wave_lengths[start_frame]
-
-if lines_use_slide_joints:
-    front_line = pymunk.SlideJoint(wing.body, line_attacher.body, (-1.3, 0), attacher_point, 0.05, front_length)
-#    front_line.max_force = 3000
-    space.add(front_line)
-    rear_line = pymunk.SlideJoint(wing.body, line_attacher.body, (1.4, 0), attacher_point, 0.05, rear_length)
-#    rear_line.max_force = 3000
-    space.add(rear_line)
-else:
-    front_line = pymunk.PinJoint(wing.body, line_attacher.body, (-1.3, 0), attacher_point)
-    front_line.distance = front_length
-    space.add(front_line)
-    rear_line = pymunk.PinJoint(wing.body, line_attacher.body, (1.4, 0), attacher_point)
-    rear_line.distance = rear_length
-    space.add(rear_line)
-    
-#damped_spring_front = pymunk.DampedSpring(wing.body, line_attacher.body, (-1.3, 0), (0.0, 0.2), default_front_length, 5000, 0.3)
-#space.add(damped_spring_front)
-#damped_spring_rear = pymunk.DampedSpring(wing.body, line_attacher.body, (1.4, 0), (0.0, 0.2), default_rear_length, 5000, 0.3)
-#space.add(damped_spring_rear)
-
-
-game_step = 0.0
-
-while True:
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            exit()
-        elif event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_SPACE:
-                running = not running
-            if event.key == pygame.K_ESCAPE:
-                exit()
-            if event.key == pygame.K_a:
-                space.remove(front_line)
-                front_line = None
-            if event.key == pygame.K_b:
-                space.remove(rear_line)
-                rear_line = None
-            if event.key == pygame.K_c:
-                thrust = not thrust
-            if event.key == pygame.K_d:
-                wing.brake = True
-            if event.key == pygame.K_e:
-                pilot.winch_up = True
-            if event.key == pygame.K_f:
-                wing.let_up = True
-            if event.key == pygame.K_g:
-                thrust_on_wing = not thrust_on_wing
-            if event.key == pygame.K_h:
-                line_wave = not line_wave
-                line_wave_time = start_frame
-            if event.key == pygame.K_k:
-                if fast_forward == 1:
-                    fast_forward = 10
-                elif fast_forward == 10:
-                    fast_forward = 100
-                else:
-                    fast_forward = 1
-            if event.key == pygame.K_l:
-                if fast_forward == 1:
-                    fast_forward = 0.25
-                elif fast_forward == 0.25:
-                    fast_forward = 0.1
-                else:
-                    fast_forward = 1
-        elif event.type == pygame.KEYUP:
-            if event.key == pygame.K_d:
-                wing.brake = False
-            if event.key == pygame.K_e:
-                pilot.winch_up = False
-            if event.key == pygame.K_f:
-                wing.let_up = False
-
-    screen.fill(pygame.Color(10,101,178))
-
-    if running:
-        step = fast_forward
-        if fast_forward < 1.0:
-            game_step += fast_forward
-            if game_step < 1.0:
-                step = 0
-            else:
-                step = 1
-                game_step = 0.0
-                
-        for i in range(0, step):
-            wing.apply_force()
-            pilot.apply_force()
-            space.step(1.0 / 60)
-        
-    update_camera_pos()
-    
-    text_y = 0
-
-    draw_background()
-    pilot.draw()
-    wing.draw()
-    draw_rope(front_line)
-    draw_rope(rear_line)
-    draw_rope(drop_line)
-    
-    pygame.display.flip()
-
-    clock.tick(60)
-    pygame.display.set_caption(f"fps: {clock.get_fps()}")
-    
+import time
+startup_start_time = time.perf_counter() # startup is timed from here to the first frame
+
+import collections
+import math
+import os
+import pygame
+import queue
+import sys
+
+import pymunk
+import pymunk.pygame_util
+from pymunk.vec2d import Vec2d
+
+import assetcache
+import livecurves
+import physicsthread
+import profiler
+import simulation
+import snapshot
+
+# only the parts of pygame the game uses, pygame.init() starts sound and joysticks too
+pygame.display.init()
+pygame.font.init()
+screen = pygame.display.set_mode((1200, 600))
+clock = pygame.time.Clock()
+running = True
+pixel_scale = 20.0 # pixels per metre
+pymunk.pygame_util.positive_y_is_up = True
+draw_options = pymunk.pygame_util.DrawOptions(screen)
+font_height = 30
+myfont = assetcache.get_font('Arial', font_height)
+image_pixel_scale = 63.0 # there are about 63 pixels per metre in the pictures I have
+image_scale = pixel_scale / image_pixel_scale
+
+pilotImg = assetcache.get_scaled_image('pilot.png', image_scale)
+wingImg = assetcache.get_scaled_image('wing.png', image_scale)
+
+pilot_centre = Vec2d(49,64) * image_scale
+wing_centre = Vec2d(93,56) * image_scale
+sprite_angle_resolution = 0.5 # degrees
+sprite_cache_bytes = 16 * 1024 * 1024 # for each sprite
+
+w = screen.get_width()
+h = screen.get_height()
+draw_forces = False
+force_draw_factor = 0.003
+background_spacing = 10 # metres
+sky_colour = (10,101,178)
+grid_colour = (128,128,128)
+ground_colour = (35,100,40)
+camera = None
+fast_forward = 1
+max_speed = physicsthread.max_speed # fast_forward setting which steps as fast as the physics thread can
+max_speed_chunk = 10 # steps between looking at the clock
+speed_multiplier = 1.0 # simulated seconds per real second, measured by the physics thread
+caption_interval = 500 # milliseconds between window title updates
+
+sim_mode = 'gliding'
+sim_mode = 'flapping'
+snapshot_file = 'snapshot.json' # F5 saves, F9 restores
+start_snapshot_file = None # start from a saved snapshot instead of the take off run
+replay_file = None # set to save the key presses on quit, check with python snapshot.py --replay
+profile_overlay = False # p shows how long each part of a frame takes
+profile_file = None # set to save the frame timings on quit
+curves_from_stdin = livecurves.curves_argument in sys.argv # the CAD editor sends new curves this way
+watch_points_file = True # use the points file again whenever it is saved
+joystick_winches = True # the arrow keys change speed and steer through the left and right winches, see winchcontrol.py
+
+
+class DrawnBody():
+    def draw_vector(self, pos, v, colour = (0,0,0)):
+        wpos = drawn(self.body).local_to_world(Vec2d(pos[0], pos[1]))
+        pygame.draw.line(screen, colour, world_to_screen(wpos), world_to_screen(wpos + v * force_draw_factor))
+
+    def draw_shape(self):
+        s = None
+        prev = None
+        body = drawn(self.body)
+        for v in self.shape.get_vertices():
+            x,y = v.rotated(body.angle) + body.position
+            if s == None:
+                s = (x,y)
+            else:
+                p = (x,y)
+                if prev != None:
+                    draw_line(prev, p)
+                prev = (x,y)
+        if prev != None:
+            draw_line(prev, s)
+
+class Wing(simulation.Wing, DrawnBody):
+    def draw(self):
+        draw_image(wing_sprite, drawn(self.body))
+        
+        #self.draw_shape()
+        
+        if draw_forces:
+            # draw lift and drag
+            self.draw_vector((frame.pressure_pos, 0), frame.lift, (0,0,255))
+            self.draw_vector((frame.pressure_pos, 0), frame.drag, (255,0,0))
+            self.draw_vector((0,0), Vec2d(1,0).rotated(frame.angle_of_wing) * 500, (255,255,0))
+            self.draw_vector((0,0), frame.wing_velocity * 300)
+            self.draw_vector((0,0), frame.wing_velocity * (-300))
+        
+class Centre(simulation.Centre, DrawnBody):
+    def draw(self):
+        self.draw_shape()
+        
+class Pilot(simulation.Pilot, DrawnBody):
+    def draw(self):
+        #self.draw_shape()
+        draw_image(pilot_sprite, drawn(self.body))
+        if frame.v_to_centre != None:
+            self.draw_vector((-0.1, 0.2), frame.v_to_centre * 100, (150,0,0))
+
+class GameSimulation(simulation.Simulation):
+    wing_class = Wing
+    pilot_class = Pilot
+    centre_class = Centre
+    
+def draw_line(s,e,col=(0,0,0)):
+    pygame.draw.line(screen, col, world_to_screen(Vec2d(s[0], s[1])), world_to_screen(Vec2d(e[0], e[1])))
+    
+class BackgroundGrid:
+    # the sky and grid drawn once onto a surface one grid square bigger than the screen
+    # each frame it is blitted shifted by the camera position, and the ground drawn over it by draw_terrain
+    def __init__(self):
+        self.surface = None
+        self.key = None
+        self.builds = 0
+
+    def get_surface(self):
+        key = (w, h, pixel_scale, background_spacing)
+        if key != self.key:
+            self.key = key
+            self.spacing_px = background_spacing * pixel_scale
+            surface_w = int(math.ceil(w + self.spacing_px)) + 1
+            surface_h = int(math.ceil(h + self.spacing_px)) + 1
+            self.surface = pygame.Surface((surface_w, surface_h)).convert()
+            self.surface.fill(sky_colour)
+            x = 0.0
+            while x < surface_w:
+                pygame.draw.line(self.surface, grid_colour, (int(round(x)), 0), (int(round(x)), surface_h))
+                x += self.spacing_px
+            y = 0.0
+            while y < surface_h:
+                pygame.draw.line(self.surface, grid_colour, (0, int(round(y))), (surface_w, int(round(y))))
+                y += self.spacing_px
+            self.builds += 1
+        return self.surface
+
+    def draw(self):
+        surface = self.get_surface()
+        # screen position of the world origin, where a vertical and a horizontal grid line cross
+        origin = world_to_screen(Vec2d(0, 0))
+        ox = math.fmod(origin.x, self.spacing_px)
+        if ox > 0:
+            ox -= self.spacing_px
+        oy = math.fmod(origin.y, self.spacing_px)
+        if oy > 0:
+            oy -= self.spacing_px
+        screen.blit(surface, (int(math.floor(ox)), int(math.floor(oy))))
+
+def draw_terrain():
+    # only the chunks of ground on the screen, a level chunk as a rectangle, others as a polygon down to the bottom of the screen
+    terrain = sim.terrain
+    first = terrain.get_index(screen_to_world(Vec2d(0, 0)).x)
+    last = terrain.get_index(screen_to_world(Vec2d(w, 0)).x)
+    for index in range(first, last + 1):
+        chunk = terrain.get_chunk(index)
+        pts = [world_to_screen(Vec2d(pt[0], pt[1])) for pt in chunk.pts]
+        left = int(math.floor(pts[0].x))
+        right = int(math.floor(pts[-1].x))
+        if chunk.is_level():
+            if pts[0].y < h:
+                ground_top = int(max(pts[0].y, 0))
+                screen.fill(ground_colour, pygame.Rect(left, ground_top, right - left, h - ground_top))
+        else:
+            polygon = [(int(math.floor(p.x)), int(math.floor(p.y))) for p in pts]
+            polygon[0] = (left, polygon[0][1])
+            polygon[-1] = (right, polygon[-1][1])
+            polygon.append((right, h))
+            polygon.append((left, h))
+            pygame.draw.polygon(screen, ground_colour, polygon)
+
+class Hud:
+    # the lines of text at the top left
+    # rendered text is kept for reuse, so a line only needs the font when its text changes at the precision
+    # shown, and values flicking between a few numbers don't need it each time; the small text surfaces are
+    # blitted straight onto the screen every frame
+    def __init__(self, col = (0,0,0), max_cached_texts = 256, font = None, line_height = None, x = 0):
+        self.col = col
+        self.font = myfont if font == None else font
+        self.line_height = int(font_height * 1.2) if line_height == None else line_height
+        self.x = x
+        self.texts = collections.OrderedDict()
+        self.max_cached_texts = max_cached_texts
+        self.renders = 0
+
+    def get_text(self, s):
+        text = self.texts.get(s)
+        if text == None:
+            text = self.font.render(s, False, self.col)
+            self.texts[s] = text
+            self.renders += 1
+            if len(self.texts) > self.max_cached_texts:
+                self.texts.popitem(last = False)
+        else:
+            self.texts.move_to_end(s)
+        return text
+
+    def draw(self, lines):
+        y = 0
+        for s in lines:
+            screen.blit(self.get_text(s), (self.x, y))
+            y += self.line_height
+
+def draw_background():
+    t = time.perf_counter()
+    background_grid.draw()
+    draw_terrain()
+        
+    if frame.line_wave:
+        if frame.front_line_length != None:
+            line_h = frame.front_line_length * 30
+            pygame.draw.rect(screen, (0,255,0), pygame.Rect(0.8 * w, h - 100 - line_h, 10, line_h))
+        if frame.rear_line_length != None:
+            line_h = frame.rear_line_length * 30
+            pygame.draw.rect(screen, (255,0,0), pygame.Rect(0.8 * w + 20, h - 100 - line_h, 10, line_h))
+
+    lines = [sim_mode] # gliding for example
+
+    if frame.angle_of_attack != None:
+        lines.append('Angle of attack = ' + ('%.1f' % frame.angle_of_attack) + ' degrees')
+    
+    lines.append('Height = ' + '%.1f' %(frame.height) + 'm')
+    lines.append('Airspeed = ' + '%.1f' % frame.airspeed + 'm/s')
+    lines.append('Distance = ' + '%.1f' % frame.distance + 'm')
+    if frame.winch_trim != None:
+        lines.append('Winch trim: front %+.2f, rear %+.2f, steer %+.2f m' % frame.winch_trim)
+    if fast_forward == max_speed:
+        lines.append('>> max x' + ('%.0f' % speed_multiplier))
+    else:
+        lines.append('Normal Speed' if (fast_forward == 1) else ('>> x' + str(fast_forward)))
+    #lines.append('Frame: ' + str(int(line_wave_time)) + ' of ' + str(line_wave_cycle_length))
+    t = frame_profiler.lap('draw_background', t)
+    hud.draw(lines)
+    t = frame_profiler.lap('hud text', t)
+    if profile_overlay:
+        profile_hud.draw(profile_lines)
+        frame_profiler.lap('profile overlay', t)
+
+def y_flipped(pos):
+    return Vec2d(pos.x, h-pos.y)
+    
+def camera_adjusted(pos):
+    new_pos = (pos - camera) * pixel_scale + Vec2d(w * 0.5, h * 0.5)
+    return new_pos
+
+def world_to_screen(pos):
+    return y_flipped(camera_adjusted(pos))
+    
+def screen_to_world(pos):
+    new_pos = y_flipped(pos)
+    return (new_pos - Vec2d(w * 0.5, h * 0.5))/pixel_scale + camera
+    
+class RotatedSprite:
+    # rotated copies of an image, kept for reuse, with the angle rounded to angle_resolution degrees
+    # least recently used copies are dropped when they take more than max_bytes
+    def __init__(self, img, centre, angle_resolution = 0.5, max_bytes = 16 * 1024 * 1024):
+        self.img = img
+        self.centre = centre # in pixels
+        self.angle_resolution = angle_resolution
+        self.max_bytes = max_bytes
+        self.cache = collections.OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, angle):
+        # returns the rotated image and where to blit it relative to the body position on screen
+        key = int(round(angle * 57 / self.angle_resolution))
+        entry = self.cache.get(key)
+        if entry != None:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return entry
+
+        self.misses += 1
+        degrees = key * self.angle_resolution
+        rect = self.img.get_rect()
+        rect_center_to_img_center = Vec2d(self.centre.x - rect.centerx, rect.centery - self.centre.y)
+        rot_img = pygame.transform.rotate(self.img, degrees)
+        rect_center_to_img_center = rect_center_to_img_center.rotated(degrees / 57)
+        rot_rect = rot_img.get_rect()
+        v_centre = Vec2d(rot_rect.centerx, rot_rect.centery)
+        rot_pos = rect_center_to_img_center + v_centre
+        entry = (rot_img, Vec2d(-rot_pos.x, rot_pos.y - rot_rect.h))
+
+        self.cache[key] = entry
+        self.bytes += rot_img.get_width() * rot_img.get_height() * rot_img.get_bytesize()
+        while self.bytes > self.max_bytes and len(self.cache) > 1:
+            old_key, old_entry = self.cache.popitem(last = False)
+            old_img = old_entry[0]
+            self.bytes -= old_img.get_width() * old_img.get_height() * old_img.get_bytesize()
+            self.evictions += 1
+        return entry
+
+    def get_stats(self):
+        total = self.hits + self.misses
+        hit_rate = 100.0 * self.hits / total if total > 0 else 0.0
+        return '%d hits, %d misses (%.1f%% hit), %d evictions, %d images, %.1f MB' % (self.hits, self.misses, hit_rate, self.evictions, len(self.cache), self.bytes / 1048576.0)
+
+frame = None # the physicsthread.PhysicsFrame being drawn
+drawn_poses = {} # body to the physicsthread.Pose to draw it at, from frame
+
+def drawn(body):
+    return drawn_poses.get(body, body)
+
+def draw_image(sprite, body):
+    if body.angle > 1000:
+        return
+    if body.angle < -1000:
+        return
+    rot_img, offset = sprite.get(body.angle)
+    screen.blit(rot_img, world_to_screen(body.position) + offset)
+    
+def draw_rope(ends):
+    # draw a line between the world positions in ends, None if it's been cut
+    if ends == None:
+        return
+    
+    draw_line(ends[0], ends[1], (128, 128, 160))
+    
+def start_simulation(state = None, config = None):
+    # a new simulation, or one carrying on from a saved state; key presses are recorded from here if replay_file is set
+    global sim, wing, pilot, replay_recorder
+    if state is not None:
+        sim = simulation.make_from_state(state, GameSimulation)
+    else:
+        sim = GameSimulation(simulation.Config(sim_mode, winch_controller = joystick_winches) if config is None else config)
+    wing = sim.wing
+    pilot = sim.pilot
+    sim.profiler = frame_profiler
+    if replay_file:
+        replay_recorder = snapshot.ReplayRecorder(sim)
+
+def start_physics(speed = 1):
+    # steps sim on its own thread from now on, so everything which changes it has to go through physics
+    global physics
+    sim.profiler = physics_profiler
+    physics = physicsthread.PhysicsThread(sim, speed, max_speed_chunk)
+    set_speed(speed)
+    physics.start()
+
+def set_speed(speed):
+    # the winch controller's tick jitter is only measured when each step has its own time to run at
+    physics.speed = speed
+    controller = sim.winch_controller
+    if controller != None:
+        controller.period = sim.config.dt / speed if speed != max_speed and speed <= 1 else None
+        controller.last_tick_time = None
+
+def quit_game():
+    physics.stop()
+    if profile_file:
+        frame_profiler.dump(profile_file)
+        print('saved profile of %d frames to %s' % (frame_profiler.frames, profile_file))
+        physics_file = os.path.splitext(profile_file)[0] + '_physics.json'
+        physics_profiler.dump(physics_file)
+        print('saved profile of %d batches of physics steps to %s' % (physics_profiler.frames, physics_file))
+    if replay_file:
+        replay_recorder.save(replay_file)
+        print('saved replay of %d key presses to %s' % (len(replay_recorder.events), replay_file))
+    if sim.winch_controller != None:
+        print('\n'.join(sim.winch_controller.get_report_lines()))
+    print('wing sprite cache: ' + wing_sprite.get_stats())
+    print('pilot sprite cache: ' + pilot_sprite.get_stats())
+    exit()
+
+def update_camera_pos():
+    global camera
+    camera = drawn(pilot.body).position + (0,5)
+
+def draw_frame(new_frame = None):
+    # draws everything and shows it, returns the time it finished
+    # draws new_frame if given, from the physics thread, or sim as it is now
+    global frame, drawn_poses
+    frame = physicsthread.PhysicsFrame(sim) if new_frame is None else new_frame
+    drawn_poses = frame.poses
+    update_camera_pos()
+
+    draw_background()
+    t = time.perf_counter()
+    pilot.draw()
+    wing.draw()
+    t = frame_profiler.lap('draw_image', t)
+    for ends in frame.ropes:
+        draw_rope(ends)
+    t = frame_profiler.lap('draw_rope', t)
+    
+    pygame.display.flip()
+    return frame_profiler.lap('display.flip', t)
+
+pilot_sprite = RotatedSprite(pilotImg, pilot_centre, sprite_angle_resolution, sprite_cache_bytes)
+wing_sprite = RotatedSprite(wingImg, wing_centre, sprite_angle_resolution, sprite_cache_bytes)
+background_grid = BackgroundGrid()
+hud = Hud()
+frame_profiler = profiler.PhaseProfiler()
+physics_profiler = profiler.PhaseProfiler() # the physics thread's steps
+profile_hud = Hud((255,255,255), font = assetcache.get_font('Courier New,Courier,DejaVu Sans Mono,monospace', 16), line_height = 18, x = int(w * 0.6))
+profile_lines = []
+
+if start_snapshot_file:
+    start_simulation(snapshot.load_state(start_snapshot_file))
+else:
+    start_simulation()
+ 
+#damper_front = simulation.Damper(sim, wing, (-1.3, 0))
+#damper_rear = simulation.Damper(sim, wing, (1.4, 0))
+
+startup_seconds = None
+last_caption_time = -caption_interval
+
+new_curves = queue.Queue() # line length curves to use from the next cycle, or the line schedule fitted to them
+
+def prepare_curves(lengths):
+    # on a thread reading curves, so fitting a line schedule to them doesn't hold up the physics
+    try:
+        return sim.prepare_line_wave_lengths(lengths)
+    except ValueError as e:
+        print('new line length curves not used: ' + str(e))
+        return None
+
+def set_next_curves(sim, lengths):
+    # on the physics thread
+    try:
+        sim.set_next_line_wave_lengths(lengths)
+        print('new line length curves, used from the next cycle')
+    except ValueError as e:
+        print('new line length curves not used: ' + str(e))
+
+def save_snapshot(sim):
+    # on the physics thread, so the state is all from one step
+    snapshot.save_snapshot(sim, snapshot_file)
+    print('saved snapshot at step %d to %s' % (sim.steps, snapshot_file))
+
+if __name__ == '__main__':
+    if curves_from_stdin:
+        livecurves.CurveReader(sys.stdin.buffer, new_curves, prepare = prepare_curves).start()
+    if watch_points_file:
+        livecurves.CurveFileWatcher(sim.config.points_file, new_curves, prepare = prepare_curves).start()
+    start_physics()
+
+    while True:
+        if physics.error is not None:
+            raise physics.error
+
+        lengths = livecurves.get_latest(new_curves)
+        if lengths != None:
+            physics.call(lambda sim, lengths = lengths: set_next_curves(sim, lengths))
+
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                quit_game()
+            elif event.type == pygame.KEYDOWN:
+                if physics.handle_key(pygame.key.name(event.key), True):
+                    pass
+                elif event.key == pygame.K_p:
+                    profile_overlay = not profile_overlay
+                elif event.key == pygame.K_SPACE:
+                    running = not running
+                    physics.running = running
+                    set_speed(fast_forward)
+                elif event.key == pygame.K_ESCAPE:
+                    quit_game()
+                elif event.key == pygame.K_k:
+                    if fast_forward == 1:
+                        fast_forward = 10
+                    elif fast_forward == 10:
+                        fast_forward = 100
+                    elif fast_forward == 100:
+                        fast_forward = max_speed
+                    else:
+                        fast_forward = 1
+                    set_speed(fast_forward)
+                elif event.key == pygame.K_l:
+                    if fast_forward == 1:
+                        fast_forward = 0.25
+                    elif fast_forward == 0.25:
+                        fast_forward = 0.1
+                    else:
+                        fast_forward = 1
+                    set_speed(fast_forward)
+                elif event.key == pygame.K_F5:
+                    physics.call(save_snapshot)
+                elif event.key == pygame.K_F9:
+                    if os.path.exists(snapshot_file):
+                        physics.stop()
+                        start_simulation(snapshot.load_state(snapshot_file))
+                        start_physics(fast_forward)
+                        physics.running = running
+                        print('restored snapshot at step %d from %s' % (sim.steps, snapshot_file))
+            elif event.type == pygame.KEYUP:
+                physics.handle_key(pygame.key.name(event.key), False)
+
+        # the physics thread steps on its own, this only draws what it last published
+        t = draw_frame(physics.get_frame())
+        if startup_seconds == None:
+            startup_seconds = time.perf_counter() - startup_start_time
+            print('started in %.3f s' % startup_seconds)
+
+        clock.tick(60)
+        frame_profiler.lap('clock.tick (idle)', t)
+        frame_profiler.end_frame()
+        now = pygame.time.get_ticks()
+        if now - last_caption_time >= caption_interval:
+            speed_multiplier = physics.speed_multiplier
+            last_caption_time = now
+            caption = f"fps: {clock.get_fps():.1f}"
+            if caption != pygame.display.get_caption()[0]:
+                pygame.display.set_caption(caption)
+            if profile_overlay:
+                profile_lines = frame_profiler.get_lines() + physics.profile_lines
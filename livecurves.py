@@ -0,0 +1,169 @@
+import os
+import queue
+import subprocess
+import sys
+import threading
+
+import pointsfile
+
+# line length curves sent to a running game, so edits in the CAD editor show straight away
+# the editor starts game.py with its stdin as a pipe and writes each new set of curves to it in the
+# binary points format; a thread in the game reads them and queues them for the main loop, which
+# hands them to the simulation to use from the start of the next cycle
+# both ends keep only the newest curves while busy: the editor writes from its own thread, so a full pipe
+# never holds up dragging, and the game prepares only the latest set it has read, skipping any before it
+# the game can also watch its points file, so curves saved by any other tool are picked up the same way
+# both threads can be given a prepare function, run on the curves before they're queued, so slow work on
+# them like fitting a line schedule is done there rather than in the game loop or on the physics thread
+
+curves_argument = '--curves-from-stdin'
+
+class Latest:
+    # holds only the newest of the values put in it, for a thread to take when it's ready for one
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.value = None
+        self.closed = False
+
+    def put(self, value):
+        with self.condition:
+            self.value = value
+            self.condition.notify()
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+
+    def take(self):
+        # waits for a value; None once closed, after the last value has been taken
+        with self.condition:
+            while self.value is None and not self.closed:
+                self.condition.wait()
+            value = self.value
+            self.value = None
+            return value
+
+def put_prepared(curves, points, prepare):
+    # prepare returns what to queue, or None to drop the points
+    if prepare is not None:
+        points = prepare(points)
+    if points is not None:
+        curves.put(points)
+
+class CurveReader(threading.Thread):
+    # reads curves from a binary stream into curves, a queue.Queue, until the stream ends
+    # reading carries on while a second thread prepares the newest set read, so a slow prepare
+    # doesn't let the stream back up into the sender
+    def __init__(self, f, curves, prepare = None):
+        threading.Thread.__init__(self, daemon = True)
+        self.f = f
+        self.curves = curves
+        self.prepare = prepare
+        self.unprepared = Latest()
+        self.error = None
+
+    def run(self):
+        threading.Thread(target = self.prepare_latest, daemon = True).start()
+        try:
+            while True:
+                points = pointsfile.read_stream(self.f)
+                if points is None:
+                    break
+                self.unprepared.put(points)
+        except Exception as e:
+            self.error = e
+        self.unprepared.close()
+
+    def prepare_latest(self):
+        while True:
+            points = self.unprepared.take()
+            if points is None:
+                return
+            put_prepared(self.curves, points, self.prepare)
+
+class CurveFileWatcher(threading.Thread):
+    # reads path into curves, a queue.Queue, whenever its modification time or size changes
+    # a cheap stat every interval seconds, and the parsing is done here rather than in the game loop
+    def __init__(self, path, curves, interval = 0.5, prepare = None):
+        threading.Thread.__init__(self, daemon = True)
+        self.path = path
+        self.curves = curves
+        self.interval = interval
+        self.prepare = prepare
+        self.last_stat = self.get_stat()
+        self.stopped = threading.Event()
+        self.error = None
+
+    def get_stat(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            stat = self.get_stat()
+            if stat is None or stat == self.last_stat:
+                continue
+            try:
+                points = pointsfile.load(self.path)
+            except Exception as e:
+                # most likely still being written; try again next time
+                self.error = e
+                continue
+            self.error = None
+            self.last_stat = stat
+            put_prepared(self.curves, points, self.prepare)
+
+    def stop(self):
+        self.stopped.set()
+
+def get_latest(curves):
+    # the most recent curves in the queue, or None; any older ones are skipped
+    latest = None
+    while True:
+        try:
+            latest = curves.get_nowait()
+        except queue.Empty:
+            return latest
+
+class GameProcess:
+    # game.py running in the background, reading curves from its stdin
+    # curves are written by a thread of its own, which only keeps the newest, so send never waits on the pipe
+    def __init__(self, directory, python = sys.executable, script = 'game.py'):
+        self.process = subprocess.Popen([python, script, curves_argument], stdin = subprocess.PIPE, cwd = directory)
+        self.unsent = Latest()
+        self.gone = False
+        threading.Thread(target = self.send_latest, daemon = True).start()
+
+    def is_running(self):
+        return not self.gone and self.process.poll() is None
+
+    def send(self, points):
+        # a copy of points is written when the thread is next free, replacing any it hasn't got to yet
+        # returns False if the game has gone
+        if not self.is_running():
+            return False
+        self.unsent.put([list(point) for point in points])
+        return True
+
+    def send_latest(self):
+        while True:
+            points = self.unsent.take()
+            if points is None:
+                break
+            try:
+                pointsfile.write_stream(self.process.stdin, points)
+            except OSError:
+                self.gone = True
+                break
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+
+    def close(self):
+        # the curves not yet written still are, then the game's stdin is closed
+        self.unsent.close()
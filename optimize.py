@@ -0,0 +1,202 @@
+import argparse
+import json
+import math
+import os
+import random
+import time
+
+import pointsfile
+import simulation
+import sweep
+
+# searches for a better pair of front/rear line length curves
+# the curves are the starting curve plus a few Fourier harmonics for each line, so a cycle still joins up end to start
+# candidates are run with sweep.run_sweep, so they use all the cores
+
+min_line_length = 1.0
+
+class CurveShape:
+    def __init__(self, base_lengths, harmonics = 3):
+        self.base_lengths = [list(p) for p in base_lengths]
+        self.harmonics = harmonics
+
+    def parameter_count(self):
+        # for each line, an offset then a cos and sin amplitude for each harmonic
+        return 2 * (1 + 2 * self.harmonics)
+
+    def make_lengths(self, params):
+        n = len(self.base_lengths)
+        per_line = 1 + 2 * self.harmonics
+        lengths = []
+        for i in range(n):
+            t = 2.0 * math.pi * i / n
+            sample = []
+            for line in range(2):
+                p = params[line * per_line:(line + 1) * per_line]
+                length = self.base_lengths[i][line] + p[0]
+                for k in range(self.harmonics):
+                    length += p[1 + 2 * k] * math.cos((k + 1) * t) + p[2 + 2 * k] * math.sin((k + 1) * t)
+                sample.append(max(length, min_line_length))
+            lengths.append(sample)
+        return lengths
+
+def get_score(result, objective):
+    if objective == 'climb':
+        return result['climb_per_cycle']
+    if objective == 'distance':
+        return result['distance'] / result['cycles']
+    raise ValueError('unknown objective: ' + objective)
+
+def write_points_file(path, lengths):
+    # text, like CadApp's ExportPointFilePath writes, unless path ends in .pointsbin
+    pointsfile.save(path, lengths)
+
+def save_checkpoint(path, state):
+    # write then rename, so an interrupted save never leaves a broken checkpoint
+    temp_path = path + '.tmp'
+    f = open(temp_path, 'w')
+    json.dump(state, f)
+    f.close()
+    os.replace(temp_path, path)
+
+def load_checkpoint(path):
+    f = open(path, 'r')
+    state = json.load(f)
+    f.close()
+    return state
+
+class Optimizer:
+    def __init__(self, base_lengths, objective = 'climb', harmonics = 3, population = 16, sigma = 0.1, cycles = 10, scenario = None, processes = None, seed = None):
+        self.shape = CurveShape(base_lengths, harmonics)
+        self.objective = objective
+        self.population = population
+        self.cycles = cycles
+        self.scenario = dict(scenario) if scenario else {}
+        self.processes = processes
+        self.rng = random.Random(seed)
+
+        # simple evolution strategy; mean moves to the best candidates, sigma adapts to the success rate
+        self.mean = [0.0] * self.shape.parameter_count()
+        self.sigma = sigma
+        self.generation = 0
+        self.best_params = list(self.mean)
+        self.best_score = None
+        self.generations_without_improvement = 0
+
+    def evaluate(self, params_list):
+        scenarios = []
+        for params in params_list:
+            scenario = dict(self.scenario)
+            scenario['line_wave_lengths'] = self.shape.make_lengths(params)
+            scenario['line_wave_cycle_length'] = len(scenario['line_wave_lengths'])
+            scenarios.append(scenario)
+        results = sweep.run_sweep(scenarios, self.processes, self.cycles)
+        scores = []
+        for result in results:
+            score = get_score(result, self.objective)
+            if math.isnan(score):
+                score = -math.inf
+            scores.append(score)
+        return scores
+
+    def step(self):
+        candidates = []
+        for i in range(self.population):
+            candidates.append([m + self.rng.gauss(0.0, self.sigma) for m in self.mean])
+        if self.best_score is None:
+            # score the starting curve too, so we never report something worse than it
+            candidates.append(list(self.mean))
+        scores = self.evaluate(candidates)
+
+        ranked = sorted(zip(scores, candidates), key = lambda sc: sc[0], reverse = True)
+        parents = ranked[:max(1, len(ranked) // 4)]
+        self.mean = [sum(c[j] for s, c in parents) / len(parents) for j in range(len(self.mean))]
+
+        improved = self.best_score is None or ranked[0][0] > self.best_score
+        if improved:
+            self.best_score = ranked[0][0]
+            self.best_params = list(ranked[0][1])
+            self.generations_without_improvement = 0
+            self.sigma *= 1.2
+        else:
+            self.generations_without_improvement += 1
+            self.sigma *= 0.85
+        self.generation += 1
+        return ranked[0][0]
+
+    def get_state(self):
+        rng_state = self.rng.getstate()
+        return {
+            'objective':self.objective,
+            'harmonics':self.shape.harmonics,
+            'base_lengths':self.shape.base_lengths,
+            'mean':self.mean,
+            'sigma':self.sigma,
+            'generation':self.generation,
+            'best_params':self.best_params,
+            'best_score':self.best_score,
+            'generations_without_improvement':self.generations_without_improvement,
+            'rng_state':[rng_state[0], list(rng_state[1]), rng_state[2]],
+            }
+
+    def set_state(self, state):
+        if state['harmonics'] != self.shape.harmonics or state['objective'] != self.objective:
+            raise ValueError('checkpoint was made with different optimizer settings')
+        self.shape.base_lengths = state['base_lengths']
+        self.mean = state['mean']
+        self.sigma = state['sigma']
+        self.generation = state['generation']
+        self.best_params = state['best_params']
+        self.best_score = state['best_score']
+        self.generations_without_improvement = state['generations_without_improvement']
+        rng_state = state['rng_state']
+        self.rng.setstate((rng_state[0], tuple(rng_state[1]), rng_state[2]))
+
+    def get_best_lengths(self):
+        return self.shape.make_lengths(self.best_params)
+
+    def run(self, generations, patience = None, checkpoint_path = None, output_path = None, min_sigma = 1e-4):
+        while self.generation < generations:
+            start_time = time.perf_counter()
+            score = self.step()
+            print('generation %d  best this generation %.4f  best so far %.4f  sigma %.4f  (%.1fs)' % (self.generation, score, self.best_score, self.sigma, time.perf_counter() - start_time))
+            if checkpoint_path:
+                save_checkpoint(checkpoint_path, self.get_state())
+            if output_path and self.generations_without_improvement == 0:
+                write_points_file(output_path, self.get_best_lengths())
+            if patience is not None and self.generations_without_improvement >= patience:
+                print('stopping, no improvement for %d generations' % patience)
+                break
+            if self.sigma < min_sigma:
+                print('stopping, step size has shrunk to nothing')
+                break
+        return self.get_best_lengths()
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Search for front and rear line length curves which fly better')
+    parser.add_argument('--points', default = 'line_lengths.points', help = 'starting curves')
+    parser.add_argument('--output', default = 'best_line_lengths.points')
+    parser.add_argument('--checkpoint', default = 'optimize_checkpoint.json', help = 'resumes from here if the file exists')
+    parser.add_argument('--objective', choices = ['climb', 'distance'], default = 'climb')
+    parser.add_argument('--harmonics', type = int, default = 3)
+    parser.add_argument('--population', type = int, default = 16)
+    parser.add_argument('--sigma', type = float, default = 0.1, help = 'starting step size in metres')
+    parser.add_argument('--generations', type = int, default = 100)
+    parser.add_argument('--patience', type = int, default = 15, help = 'stop after this many generations without improvement')
+    parser.add_argument('--cycles', type = int, default = 10, help = 'flapping cycles per evaluation')
+    parser.add_argument('--processes', type = int, default = None)
+    parser.add_argument('--seed', type = int, default = None)
+    args = parser.parse_args()
+
+    base_lengths = simulation.load_line_wave_lengths(args.points)
+    optimizer = Optimizer(base_lengths, args.objective, args.harmonics, args.population, args.sigma, args.cycles, processes = args.processes, seed = args.seed)
+    if args.checkpoint and os.path.exists(args.checkpoint):
+        optimizer.set_state(load_checkpoint(args.checkpoint))
+        print('resuming from generation %d' % optimizer.generation)
+
+    optimizer.run(args.generations, args.patience, args.checkpoint, args.output)
+    write_points_file(args.output, optimizer.get_best_lengths())
+    print('best score %.4f written to %s' % (optimizer.best_score, args.output))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+import copy
+import queue
+import threading
+import time
+import traceback
+
+from pymunk.vec2d import Vec2d
+
+import simulation
+
+# runs a Simulation on its own thread at a fixed timestep, so slow drawing doesn't slow the physics,
+# and fast forward doesn't hold up the window
+# after each batch of steps the thread publishes a PhysicsFrame, a copy of everything the game draws;
+# a frame is never changed once published, and the latest two are swapped in as one tuple, so drawing
+# reads a consistent pair without a lock while the thread carries on stepping
+# key presses and anything else which changes the simulation go through a queue.SimpleQueue, which
+# never blocks the sender, and are run by the thread between steps
+
+max_speed = 'max' # speed which steps as fast as the machine can
+
+class Pose:
+    # where a body is, or is drawn
+    def __init__(self, position, angle):
+        self.position = position
+        self.angle = angle
+
+    def local_to_world(self, v):
+        return self.position + Vec2d(v[0], v[1]).rotated(self.angle)
+
+def get_pose(body):
+    return Pose(body.position, body.angle)
+
+def get_rope_ends(rope):
+    # the world positions of both ends of a line, or None if it's been cut
+    if rope is None:
+        return None
+    return (rope.a.local_to_world(rope.anchor_a), rope.b.local_to_world(rope.anchor_b))
+
+def interpolate(a, b, fraction):
+    return a + (b - a) * fraction
+
+class PhysicsFrame:
+    # what the game draws of the simulation after a step
+    def __init__(self, sim, time = 0.0):
+        wing = sim.wing
+        pilot = sim.pilot
+        self.steps = sim.steps
+        self.time = time # the real time this step was due, for drawing between frames
+        self.poses = {wing.body:get_pose(wing.body), pilot.body:get_pose(pilot.body)}
+        if sim.centre is not None:
+            self.poses[sim.centre.body] = get_pose(sim.centre.body)
+        self.ropes = [get_rope_ends(sim.front_line), get_rope_ends(sim.rear_line), get_rope_ends(sim.drop_line)]
+        self.line_wave = sim.line_wave
+        self.front_line_length = sim.get_line_length(sim.front_line)
+        self.rear_line_length = sim.get_line_length(sim.rear_line)
+        self.angle_of_attack = wing.angle_of_attack
+        self.angle_of_wing = wing.angle_of_wing
+        self.lift = wing.lift
+        self.drag = wing.drag
+        self.pressure_pos = wing.pressure_pos
+        self.wing_velocity = wing.body.velocity
+        self.v_to_centre = pilot.v_to_centre
+        self.height = sim.get_height()
+        self.airspeed = sim.get_airspeed()
+        self.distance = sim.get_distance()
+        controller = sim.winch_controller
+        self.winch_trim = None if controller is None else (controller.front_offset, controller.rear_offset, controller.steering)
+
+    def interpolated(self, previous, fraction):
+        # a copy with the bodies and lines fraction of the way from previous to here
+        frame = copy.copy(self)
+        frame.poses = {}
+        for body, pose in self.poses.items():
+            before = previous.poses.get(body, pose)
+            frame.poses[body] = Pose(interpolate(before.position, pose.position, fraction), interpolate(before.angle, pose.angle, fraction))
+        frame.ropes = []
+        for ends, before in zip(self.ropes, previous.ropes):
+            if ends is None or before is None:
+                frame.ropes.append(ends)
+            else:
+                frame.ropes.append((interpolate(before[0], ends[0], fraction), interpolate(before[1], ends[1], fraction)))
+        return frame
+
+class PhysicsThread(threading.Thread):
+    # speed is simulated steps per step of real time, or max_speed
+    # if the machine can't keep up, steps more than max_lag seconds late are dropped rather than caught up on
+    def __init__(self, sim, speed = 1, max_speed_chunk = 10, publish_interval = 1.0 / 120, max_lag = 0.25):
+        threading.Thread.__init__(self, daemon = True)
+        self.sim = sim
+        self.speed = speed
+        self.running = True # False pauses
+        self.max_speed_chunk = max_speed_chunk # steps between looking at the clock at max speed
+        self.publish_interval = publish_interval # seconds of stepping between frames at max speed
+        self.max_lag = max_lag
+        self.inputs = queue.SimpleQueue()
+        frame = PhysicsFrame(sim, time.perf_counter())
+        self.frames = (frame, frame) # previous and latest, replaced together
+        self.speed_multiplier = 1.0 # simulated seconds per real second, measured
+        self.profile_lines = [] # from sim.profiler every half a second, if it has one
+        self.stopped = threading.Event()
+        self.error = None
+
+    def call(self, function):
+        # function(sim) is run on this thread before the next step
+        self.inputs.put(function)
+
+    def handle_key(self, key, down):
+        # queues the key for sim.handle_key; returns False for keys which don't change the physics, like it
+        if key not in simulation.input_keys:
+            return False
+        self.call(lambda sim: sim.handle_key(key, down))
+        return True
+
+    def get_frame(self, now = None):
+        # the latest frame, or at normal speed and slower, one part of the way from the one before to it by the
+        # time now, which draws the bodies moving smoothly a step behind
+        previous, latest = self.frames
+        if self.speed == max_speed or self.speed > 1 or latest.time <= previous.time:
+            return latest
+        if now is None:
+            now = time.perf_counter()
+        fraction = (now - latest.time) / (latest.time - previous.time)
+        return latest.interpolated(previous, min(max(fraction, 0.0), 1.0))
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+    def run(self):
+        try:
+            self.fly()
+        except Exception as e:
+            self.error = e
+            traceback.print_exc()
+
+    def run_inputs(self):
+        while True:
+            try:
+                function = self.inputs.get_nowait()
+            except queue.Empty:
+                return
+            function(self.sim)
+
+    def publish(self, step_time):
+        previous, latest = self.frames
+        self.frames = (latest, PhysicsFrame(self.sim, step_time))
+
+    def fly(self):
+        sim = self.sim
+        dt = sim.config.dt
+        next_step_time = time.perf_counter()
+        measure_time = next_step_time
+        measure_steps = sim.steps
+        while not self.stopped.is_set():
+            self.run_inputs()
+            now = time.perf_counter()
+            speed = self.speed
+            steps_before = sim.steps
+            if not self.running:
+                next_step_time = now
+                self.stopped.wait(self.publish_interval)
+            elif speed == max_speed:
+                end_time = now + self.publish_interval
+                while time.perf_counter() < end_time:
+                    sim.step(self.max_speed_chunk)
+                next_step_time = time.perf_counter()
+                self.publish(next_step_time)
+                # lets the drawing thread have the GIL
+                time.sleep(0)
+            else:
+                step_seconds = dt / speed
+                if now >= next_step_time:
+                    steps = int((now - next_step_time) / step_seconds) + 1
+                    if (steps - 1) * step_seconds > self.max_lag:
+                        # too far behind, carry on from now
+                        steps = 1
+                        next_step_time = now
+                    sim.step(steps)
+                    step_time = next_step_time + (steps - 1) * step_seconds
+                    next_step_time += steps * step_seconds
+                    self.publish(step_time)
+                wait = next_step_time - time.perf_counter()
+                if speed > 1:
+                    # a batch of steps each time, rather than a frame for every step
+                    wait = max(wait, self.publish_interval)
+                self.stopped.wait(max(wait, 0.0))
+
+            if sim.profiler is not None and sim.steps != steps_before:
+                sim.profiler.end_frame()
+            now = time.perf_counter()
+            if now - measure_time >= 0.5:
+                self.speed_multiplier = (sim.steps - measure_steps) * dt / (now - measure_time)
+                measure_time = now
+                measure_steps = sim.steps
+                if sim.profiler is not None:
+                    # made here, as the profiler's lists can't be read while this thread adds to them
+                    self.profile_lines = sim.profiler.get_lines('ms per batch')
+                    if sim.winch_controller is not None:
+                        self.profile_lines += sim.winch_controller.get_report_lines()
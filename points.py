@@ -1,95 +1,158 @@
-import cad
-import math
-import geom
-from Object import Object
-import os
-
-points_dir = os.path.dirname(os.path.realpath(__file__))
-
-type = 0
-y_scale = 10.0
-rear_render_x_offset = 0.2
-
-class Points(Object):
-    def __init__(self):
-        Object.__init__(self, 0)
-        
-        self.points = []  # list of (front line length, rear line length)   
-        self.box = None  # if box is None, then the curves need reloading
-        
-    def GetType(self):
-        return type
-
-    def TypeName(self):
-        return "Points"
-    
-    def GetTypeString(self):
-        return self.TypeName()
-    
-    def HasColor(self):
-        return False
-    
-    def GetIconFilePath(self):
-        return points_dir + '/points.png'
-        
-    def OnGlCommands(self, select, marked, no_color):
-        i = 0
-        global y_scale
-        # draw front lines blue
-        cad.BeginLines()
-        cad.DrawColor(cad.Color(0,0,255))
-        for point in self.points:
-            cad.GlVertex(geom.Point3D(i, point[0] * y_scale, 0.0))
-            i += 1
-        cad.EndLinesOrTriangles()
-        
-        # draw rear lines red
-        cad.BeginLines()
-        cad.DrawColor(cad.Color(255,0,0))
-        i = 0
-        global rear_render_x_offset
-        for point in self.points:
-            cad.GlVertex(geom.Point3D(i, point[1] * y_scale, 0.0))
-            i += 1
-        cad.EndLinesOrTriangles()
-        
-    def GetGrippers(self, just_for_endof):
-        global y_scale
-        global rear_render_x_offset
-        i = 0
-        for point in self.points:
-            #cad.AddGripper(cad.GripData(geom.Point3D(i, point[0] * y_scale, 0.0), cad.GripperType.Stretch, 0))
-            cad.AddGripper(cad.GripData(geom.Point3D(i, point[1] * y_scale, 0.0), cad.GripperType.Stretch, 0))
-            i += 1
-
-    def Stretch(self):
-        global y_scale
-        global rear_render_x_offset
-        p = cad.GetStretchPoint()
-        shift = cad.GetStretchShift()
-        i = 0
-        for point in self.points:
-            if p == geom.Point3D(i, point[0] * y_scale, 0.0):
-                point[0] += (shift.y / y_scale)
-                return
-            if p == geom.Point3D(i, point[1] * y_scale, 0.0):
-                point[1] += (shift.y / y_scale)
-                return
-            i += 1
-            
-    def ModifyAtPoint(self, p, front):
-        global y_scale
-        global rear_render_x_offset
-        index = 0 if front else 1
-        extra_x = 0.0 if front else rear_render_x_offset
-        i = int(p.x + 0.5 + extra_x)
-        if i < 0 or i >= len(self.points):
-            return
-        self.points[i][index] = p.y / y_scale
-        
-         
-    def GetBox(self):
-        box = geom.Box3D()
-        box.InsertPoint(0,0,0)
-        box.InsertPoint(240,100,0)
-        return box
+import cad
+import math
+import geom
+from Object import Object
+import os
+
+points_dir = os.path.dirname(os.path.realpath(__file__))
+
+type = 0
+y_scale = 10.0
+rear_render_x_offset = 0.2
+
+class Points(Object):
+    def __init__(self):
+        Object.__init__(self, 0)
+        
+        self.points = []  # list of (front line length, rear line length)   
+        self.box = None  # if box is None, then the curves need reloading
+        
+        # the drawn curves and the grippers are kept, as making them for every sample on every redraw is slow
+        # if self.points is replaced they are all made again, otherwise only the samples changed are
+        self.cached_points = None
+        self.front_vertices = []
+        self.rear_vertices = []
+        self.grippers = []
+        self.gripper_samples = {}  # (x, y) of each gripper to (sample index, 0 for front or 1 for rear)
+        
+    def GetType(self):
+        return type
+
+    def TypeName(self):
+        return "Points"
+    
+    def GetTypeString(self):
+        return self.TypeName()
+    
+    def HasColor(self):
+        return False
+    
+    def GetIconFilePath(self):
+        return points_dir + '/points.png'
+        
+    def MakeACopy(self):
+        copy = Points()
+        copy.CopyFrom(self)
+        return copy
+        
+    def CopyFrom(self, object):
+        self.points = [list(point) for point in object.points]
+        
+    def CheckCache(self):
+        if self.cached_points is self.points and len(self.front_vertices) == len(self.points):
+            return
+        self.cached_points = self.points
+        self.front_vertices = []
+        self.rear_vertices = []
+        self.grippers = []
+        self.gripper_samples = {}
+        for i in range(len(self.points)):
+            self.front_vertices.append(None)
+            self.rear_vertices.append(None)
+            self.grippers.append(None)
+            self.UpdateCache(i)
+            
+    def UpdateCache(self, i):
+        # remake the vertices and gripper for one sample, after it has been changed
+        global y_scale
+        point = self.points[i]
+        old_rear = self.rear_vertices[i]
+        if old_rear is not None and self.gripper_samples.get((old_rear.x, old_rear.y)) == (i, 1):
+            del self.gripper_samples[(old_rear.x, old_rear.y)]
+        self.front_vertices[i] = geom.Point3D(i, point[0] * y_scale, 0.0)
+        self.rear_vertices[i] = geom.Point3D(i, point[1] * y_scale, 0.0)
+        #self.front_grippers[i] = cad.GripData(self.front_vertices[i], cad.GripperType.Stretch, 0)
+        self.grippers[i] = cad.GripData(self.rear_vertices[i], cad.GripperType.Stretch, 0)
+        self.gripper_samples[(self.rear_vertices[i].x, self.rear_vertices[i].y)] = (i, 1)
+        
+    def FindSample(self, p):
+        # which sample and curve a gripper point is on, or None
+        sample = self.gripper_samples.get((p.x, p.y))
+        if sample != None:
+            return sample
+        # not exactly on a gripper; the x is the sample index, so take the nearer curve there
+        i = int(math.floor(p.x + 0.5))
+        if i < 0 or i >= len(self.points):
+            return None
+        if abs(p.y - self.front_vertices[i].y) < abs(p.y - self.rear_vertices[i].y):
+            return (i, 0)
+        return (i, 1)
+        
+    def OnGlCommands(self, select, marked, no_color):
+        self.CheckCache()
+        
+        # draw front lines blue
+        cad.BeginLines()
+        cad.DrawColor(cad.Color(0,0,255))
+        for v in self.front_vertices:
+            cad.GlVertex(v)
+        cad.EndLinesOrTriangles()
+        
+        # draw rear lines red
+        cad.BeginLines()
+        cad.DrawColor(cad.Color(255,0,0))
+        for v in self.rear_vertices:
+            cad.GlVertex(v)
+        cad.EndLinesOrTriangles()
+        
+    def GetGrippers(self, just_for_endof):
+        self.CheckCache()
+        for gripper in self.grippers:
+            cad.AddGripper(gripper)
+
+    def Stretch(self):
+        # the CAD calls this once for each selected gripper, with its point
+        global y_scale
+        self.CheckCache()
+        sample = self.FindSample(cad.GetStretchPoint())
+        if sample == None:
+            return
+        i, index = sample
+        self.points[i][index] += (cad.GetStretchShift().y / y_scale)
+        self.UpdateCache(i)
+            
+    def ModifyAtPoint(self, p, front):
+        global y_scale
+        global rear_render_x_offset
+        index = 0 if front else 1
+        extra_x = 0.0 if front else rear_render_x_offset
+        i = int(p.x + 0.5 + extra_x)
+        if i < 0 or i >= len(self.points):
+            return
+        self.points[i][index] = p.y / y_scale
+        self.CheckCache()
+        self.UpdateCache(i)
+        
+    def ModifyBetween(self, p0, p1, front):
+        # like ModifyAtPoint for every sample from p0 to p1, with the lengths on the straight line between them
+        global y_scale
+        global rear_render_x_offset
+        index = 0 if front else 1
+        extra_x = 0.0 if front else rear_render_x_offset
+        i0 = int(p0.x + 0.5 + extra_x)
+        i1 = int(p1.x + 0.5 + extra_x)
+        if i0 == i1:
+            self.ModifyAtPoint(p1, front)
+            return
+        self.CheckCache()
+        for i in range(max(min(i0, i1), 0), min(max(i0, i1) + 1, len(self.points))):
+            fraction = float(i - i0) / (i1 - i0)
+            self.points[i][index] = (p0.y + (p1.y - p0.y) * fraction) / y_scale
+            self.UpdateCache(i)
+        
+         
+    def GetBox(self):
+        box = geom.Box3D()
+        box.InsertPoint(0,0,0)
+        box.InsertPoint(240,100,0)
+        return box
@@ -0,0 +1,304 @@
+import argparse
+import array
+import ast
+import json
+import mmap
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+
+# reading and writing line length curves
+# the original format is a printed python list of [front, rear] pairs, which is still read and written
+# the binary format is:
+#   a 32 byte header; magic, version, data offset, sample count, curve count, timestep
+#   the curve names, each a 2 byte length and utf-8 text, padded to a multiple of 8 bytes
+#   the samples as little-endian doubles, one row of curve values per sample
+# so the samples can be memory mapped straight into a numpy array
+
+magic = b'PGPOINTS'
+version = 1
+header_format = '<8sIIIId'
+header_size = struct.calcsize(header_format)
+count_offset = 16 # where the sample count is in the header, filled in when a streamed file is closed
+default_curve_names = ('front', 'rear')
+default_timestep = 1.0 / 60
+binary_extension = 'pointsbin'
+
+class PointsFileError(Exception):
+    pass
+
+class PointsHeader:
+    def __init__(self, sample_count, curve_names, timestep, data_offset):
+        self.sample_count = sample_count
+        self.curve_names = list(curve_names)
+        self.timestep = timestep
+        self.data_offset = data_offset
+
+def make_names_block(curve_names):
+    block = b''
+    for name in curve_names:
+        b = name.encode('utf-8')
+        block += struct.pack('<H', len(b)) + b
+    padding = (-(header_size + len(block))) % 8
+    return block + b'\0' * padding
+
+def is_binary(path):
+    f = open(path, 'rb')
+    start = f.read(len(magic))
+    f.close()
+    return start == magic
+
+def read_header(data):
+    if len(data) < header_size:
+        raise PointsFileError('file too short for a points header')
+    file_magic, file_version, data_offset, sample_count, curve_count, timestep = struct.unpack_from(header_format, data, 0)
+    if file_magic != magic:
+        raise PointsFileError('not a binary points file')
+    if file_version != version:
+        raise PointsFileError('unsupported points file version ' + str(file_version))
+    curve_names = []
+    pos = header_size
+    for i in range(curve_count):
+        if pos + 2 > len(data):
+            raise PointsFileError('points header is truncated')
+        n = struct.unpack_from('<H', data, pos)[0]
+        pos += 2
+        if pos + n > len(data):
+            raise PointsFileError('points header is truncated')
+        try:
+            curve_names.append(bytes(data[pos:pos + n]).decode('utf-8'))
+        except UnicodeDecodeError:
+            raise PointsFileError('curve name is not utf-8')
+        pos += n
+    if data_offset < pos:
+        raise PointsFileError('points data starts inside the header')
+    if data_offset + sample_count * curve_count * 8 > len(data):
+        raise PointsFileError('points file is truncated')
+    return PointsHeader(sample_count, curve_names, timestep, data_offset)
+
+def check_line_curves(curve_names):
+    # line length curves are a front and a rear curve, in that order
+    if list(curve_names) != list(default_curve_names):
+        raise PointsFileError('expected front and rear curves, not ' + ', '.join(curve_names))
+
+class PointsWriter:
+    # writes a binary points file a sample ( or many samples ) at a time
+    def __init__(self, path, curve_names = default_curve_names, timestep = default_timestep):
+        self.curve_count = len(curve_names)
+        self.sample_count = 0
+        self.f = open(path, 'wb')
+        names = make_names_block(curve_names)
+        self.f.write(struct.pack(header_format, magic, version, header_size + len(names), 0, self.curve_count, timestep))
+        self.f.write(names)
+
+    def write(self, sample):
+        if len(sample) != self.curve_count:
+            raise PointsFileError('sample has ' + str(len(sample)) + ' values, expected ' + str(self.curve_count))
+        self.write_many([sample])
+
+    def write_many(self, samples):
+        values = array.array('d')
+        n = 0
+        for sample in samples:
+            if len(sample) != self.curve_count:
+                raise PointsFileError('sample has ' + str(len(sample)) + ' values, expected ' + str(self.curve_count))
+            values.extend(sample)
+            n += 1
+        if sys.byteorder != 'little':
+            values.byteswap()
+        values.tofile(self.f)
+        self.sample_count += n
+
+    def close(self):
+        if self.f is None:
+            return
+        self.f.seek(count_offset)
+        self.f.write(struct.pack('<I', self.sample_count))
+        self.f.close()
+        self.f = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+def pack_binary(points, curve_names = default_curve_names, timestep = default_timestep):
+    # the bytes of a binary points file
+    values = array.array('d')
+    for sample in points:
+        if len(sample) != len(curve_names):
+            raise PointsFileError('sample has ' + str(len(sample)) + ' values, expected ' + str(len(curve_names)))
+        values.extend(sample)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    names = make_names_block(curve_names)
+    header = struct.pack(header_format, magic, version, header_size + len(names), len(points), len(curve_names), timestep)
+    return header + names + values.tobytes()
+
+def write_stream(f, points):
+    # one set of curves onto a pipe or socket, in the binary file format
+    f.write(pack_binary(points))
+    f.flush()
+
+def read_exactly(f, n):
+    data = b''
+    while len(data) < n:
+        more = f.read(n - len(data))
+        if not more:
+            break
+        data += more
+    return data
+
+def read_stream(f):
+    # the next set of curves written by write_stream, or None when the stream has ended
+    data = read_exactly(f, header_size)
+    if len(data) == 0:
+        return None
+    if len(data) < header_size:
+        raise PointsFileError('stream ended in a points header')
+    file_magic, file_version, data_offset, sample_count, curve_count, timestep = struct.unpack(header_format, data)
+    if file_magic != magic:
+        raise PointsFileError('not a binary points stream')
+    data += read_exactly(f, data_offset - header_size + sample_count * curve_count * 8)
+    header = read_header(data)
+    check_line_curves(header.curve_names)
+    values = array.array('d')
+    values.frombytes(data[header.data_offset:])
+    if sys.byteorder != 'little':
+        values.byteswap()
+    n = len(header.curve_names)
+    return [values[i:i + n].tolist() for i in range(0, len(values), n)]
+
+def save_binary(path, points, curve_names = default_curve_names, timestep = default_timestep):
+    with PointsWriter(path, curve_names, timestep) as writer:
+        writer.write_many(points)
+
+def save_text(path, points):
+    f = open(path, 'w')
+    f.write(str([list(p) for p in points]) + '\n')
+    f.close()
+
+def save(path, points):
+    # binary if the file extension asks for it, otherwise the original text format
+    if path.lower().endswith('.' + binary_extension):
+        save_binary(path, points)
+    else:
+        save_text(path, points)
+
+def load_text(path):
+    text = open(path, 'r').read()
+    try:
+        # a printed list of lists of floats is also valid json, which is much quicker to read
+        points = json.loads(text)
+    except ValueError:
+        # anything else python would print, like tuples; literal_eval never runs code
+        points = ast.literal_eval(text)
+    points = [list(p) for p in points]
+    for p in points:
+        if len(p) != len(default_curve_names):
+            raise PointsFileError('expected [front, rear] pairs in ' + path)
+    return points
+
+def read_binary(path):
+    # returns the header and the samples as one flat array of doubles
+    f = open(path, 'rb')
+    data = f.read()
+    f.close()
+    header = read_header(data)
+    values = array.array('d')
+    values.frombytes(data[header.data_offset:header.data_offset + header.sample_count * len(header.curve_names) * 8])
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return header, values
+
+def load_binary(path):
+    header, values = read_binary(path)
+    check_line_curves(header.curve_names)
+    n = len(header.curve_names)
+    return [values[i:i + n].tolist() for i in range(0, len(values), n)]
+
+def load(path):
+    # list of [front, rear] lists from either format
+    if is_binary(path):
+        return load_binary(path)
+    return load_text(path)
+
+def load_timestep(path):
+    # seconds between samples; a binary file says, text files are a sample for each 1/60 s step
+    if not is_binary(path):
+        return default_timestep
+    f = open(path, 'rb')
+    data = f.read(header_size)
+    f.close()
+    if len(data) < header_size:
+        raise PointsFileError('file too short for a points header')
+    return struct.unpack(header_format, data)[5]
+
+def load_array(path):
+    # the samples as a numpy array of shape (sample count, curve count)
+    # binary files are memory mapped, so nothing is read until it is used
+    import numpy
+    if not is_binary(path):
+        return numpy.array(load_text(path), dtype = float)
+    f = open(path, 'rb')
+    data = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+    f.close()
+    header = read_header(data)
+    n = len(header.curve_names)
+    values = numpy.frombuffer(data, dtype = '<f8', count = header.sample_count * n, offset = header.data_offset)
+    return values.reshape(header.sample_count, n)
+
+def benchmark(sample_count):
+    # times loading the same curves in each format
+    rng = random.Random(0)
+    points = [[rng.uniform(7.0, 9.5), rng.uniform(7.0, 9.5)] for i in range(sample_count)]
+    directory = tempfile.mkdtemp()
+    text_path = os.path.join(directory, 'curves.points')
+    binary_path = os.path.join(directory, 'curves.' + binary_extension)
+    save_text(text_path, points)
+    save_binary(binary_path, points)
+    print('%d samples: text file %.1f MB, binary file %.1f MB' % (sample_count, os.path.getsize(text_path) / 1e6, os.path.getsize(binary_path) / 1e6))
+
+    def time_load(name, function):
+        start_time = time.perf_counter()
+        result = function()
+        seconds = time.perf_counter() - start_time
+        print('  %-34s %8.1f ms' % (name, seconds * 1000))
+        return result
+
+    time_load('text with eval (old loader)', lambda: eval(open(text_path, 'r').read()))
+    time_load('text with load_text', lambda: load_text(text_path))
+    loaded = time_load('binary with load_binary', lambda: load_binary(binary_path))
+    if loaded != points:
+        raise PointsFileError('binary round trip changed the samples')
+    try:
+        import numpy
+        time_load('binary with load_array (mmap)', lambda: load_array(binary_path))
+        time_load('binary with load_array, summed', lambda: load_array(binary_path).sum())
+    except ImportError:
+        pass
+
+    os.remove(text_path)
+    os.remove(binary_path)
+    os.rmdir(directory)
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Convert line length curve files, or time loading them')
+    parser.add_argument('input', nargs = '?', help = 'points file to convert, text or binary')
+    parser.add_argument('output', nargs = '?', help = 'binary if it ends in .' + binary_extension + ', otherwise text')
+    parser.add_argument('--benchmark', type = int, metavar = 'SAMPLES', help = 'time loading this many samples in each format')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.benchmark)
+    elif args.input and args.output:
+        save(args.output, load(args.input))
+    else:
+        parser.print_help()
+
+if __name__ == '__main__':
+    main()
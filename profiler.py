@@ -0,0 +1,123 @@
+import array
+import bisect
+import collections
+import json
+import time
+
+# times each phase of a frame, like the physics calls and the drawing
+# times are added up over a frame, as a frame can run many physics steps, then kept per frame so
+# percentiles show the spread; the last window frames are used for the overlay, all of them for dump
+
+def get_percentile(sorted_values, p):
+    # nearest rank, p from 0 to 100
+    if len(sorted_values) == 0:
+        return 0.0
+    i = int(round(p / 100.0 * (len(sorted_values) - 1)))
+    return sorted_values[i]
+
+class PhaseProfiler:
+    def __init__(self, window = 600):
+        self.window = window
+        self.recent = collections.OrderedDict() # phase name to a deque of seconds per frame
+        self.history = collections.OrderedDict() # phase name to an array of seconds for every frame
+        self.current = {}
+        self.frames = 0
+        self.start_time = time.perf_counter()
+
+    def add(self, name, seconds):
+        self.current[name] = self.current.get(name, 0.0) + seconds
+
+    def lap(self, name, start):
+        # adds the time since start to name and returns now, to start the next phase from
+        now = time.perf_counter()
+        self.current[name] = self.current.get(name, 0.0) + now - start
+        return now
+
+    def end_frame(self):
+        for name in self.current:
+            if name not in self.recent:
+                # a phase first seen now took no time in the frames before
+                self.recent[name] = collections.deque([0.0] * min(self.frames, self.window), self.window)
+                self.history[name] = array.array('d', [0.0] * self.frames)
+        for name in self.recent:
+            seconds = self.current.get(name, 0.0)
+            self.recent[name].append(seconds)
+            self.history[name].append(seconds)
+        self.current = {}
+        self.frames += 1
+
+    def get_stats(self, values):
+        s = sorted(values)
+        return {
+            'mean_ms':1000.0 * sum(s) / len(s) if len(s) > 0 else 0.0,
+            'p50_ms':1000.0 * get_percentile(s, 50),
+            'p90_ms':1000.0 * get_percentile(s, 90),
+            'p99_ms':1000.0 * get_percentile(s, 99),
+            'max_ms':1000.0 * s[-1] if len(s) > 0 else 0.0,
+            }
+
+    def get_lines(self, title = 'ms per frame'):
+        # a table of the recent per frame times, for the overlay
+        lines = ['%-18s %6s %6s %6s' % (title, 'p50', 'p90', 'p99')]
+        total = None
+        for name, values in self.recent.items():
+            stats = self.get_stats(values)
+            lines.append('%-18s %6.2f %6.2f %6.2f' % (name[:18], stats['p50_ms'], stats['p90_ms'], stats['p99_ms']))
+            if total is None:
+                total = list(values)
+            else:
+                total = [a + b for a, b in zip(total, values)]
+        if total is not None:
+            stats = self.get_stats(total)
+            lines.append('%-18s %6.2f %6.2f %6.2f' % ('total', stats['p50_ms'], stats['p90_ms'], stats['p99_ms']))
+        return lines
+
+    def get_profile(self):
+        return {
+            'frames':self.frames,
+            'seconds':time.perf_counter() - self.start_time,
+            'phases':dict((name, self.get_stats(values)) for name, values in self.history.items()),
+            }
+
+    def dump(self, path):
+        f = open(path, 'w')
+        json.dump(self.get_profile(), f, indent = 1)
+        f.close()
+
+class Histogram:
+    # counts of values in fixed bins, for timings which come too often to keep them all
+    # bin i counts values from edges[i - 1] up to edges[i], the last bin everything above the last edge
+    def __init__(self, edges):
+        self.edges = list(edges)
+        self.counts = [0] * (len(self.edges) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = None
+
+    def add(self, value):
+        self.counts[bisect.bisect_right(self.edges, value)] += 1
+        self.count += 1
+        self.total += value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def get_count_above(self, value):
+        # values in the bins above value, so exact if value is one of the edges
+        return sum(self.counts[bisect.bisect_right(self.edges, value):])
+
+    def get_lines(self, title, scale = 1e6, unit = 'us'):
+        # a line per bin with anything in it, with a bar of # for its share of the values
+        lines = ['%s, %d values, mean %.1f %s, max %.1f %s' % (title, self.count, scale * self.total / max(self.count, 1), unit, scale * (self.max or 0.0), unit)]
+        for i in range(len(self.counts)):
+            if self.counts[i] == 0:
+                continue
+            if i < len(self.edges):
+                label = '< %g' % (scale * self.edges[i])
+            else:
+                label = '>= %g' % (scale * self.edges[-1])
+            share = self.counts[i] / float(self.count)
+            lines.append('%10s %s %7d %5.1f%% %s' % (label, unit, self.counts[i], 100.0 * share, '#' * int(round(share * 20))))
+        return lines
+
+    def to_dict(self):
+        return {'edges':self.edges, 'counts':self.counts, 'count':self.count, 'total':self.total, 'max':self.max}
@@ -0,0 +1,180 @@
+import argparse
+import bisect
+import json
+
+import pointsfile
+
+# line length schedules as control points on a time axis, so they don't depend on the physics step
+# between control points each length follows a monotone cubic, which never overshoots the control values
+# the schedule repeats every period seconds, and is looked up through a table made once, linear between entries,
+# so the lengths at any time cost the same as indexing the per-frame curves did
+
+default_tolerance = 0.02 # metres, for from_samples
+default_table_rate = 2000 # lookup table entries per second
+default_sample_dt = 1.0 / 60 # text .points files have a sample for each 1/60 s step; binary ones say, see pointsfile.load_timestep
+
+class ScheduleError(Exception):
+    pass
+
+def get_slopes(times, values, period):
+    # Fritsch-Carlson slopes at each control point, for a curve that repeats after period
+    n = len(times)
+    slopes = []
+    for i in range(n):
+        t0 = times[i - 1] - (period if i == 0 else 0.0)
+        t1 = times[i]
+        t2 = times[(i + 1) % n] + (period if i == n - 1 else 0.0)
+        d0 = (values[i] - values[i - 1]) / (t1 - t0)
+        d1 = (values[(i + 1) % n] - values[i]) / (t2 - t1)
+        if d0 * d1 <= 0.0:
+            # a peak or trough, keep it flat so the curve doesn't go past it
+            slopes.append(0.0)
+        else:
+            w0 = 2.0 * (t2 - t1) + (t1 - t0)
+            w1 = (t2 - t1) + 2.0 * (t1 - t0)
+            slopes.append((w0 + w1) / (w0 / d0 + w1 / d1))
+    return slopes
+
+class LineSchedule:
+    def __init__(self, times, lengths, period, table_rate = default_table_rate):
+        # times in seconds from 0 up to but not including period, lengths a [front, rear] for each time
+        if len(times) != len(lengths) or len(times) < 2:
+            raise ScheduleError('a schedule needs at least 2 control points, with a time and lengths for each')
+        for i in range(len(times)):
+            if times[i] < 0.0 or times[i] >= period or (i > 0 and times[i] <= times[i - 1]):
+                raise ScheduleError('control point times must increase, from 0 up to the period')
+        self.times = list(times)
+        self.lengths = [list(p) for p in lengths]
+        self.period = period
+        self.table_rate = table_rate
+        self.fronts = [p[0] for p in self.lengths]
+        self.rears = [p[1] for p in self.lengths]
+        self.front_slopes = get_slopes(self.times, self.fronts, period)
+        self.rear_slopes = get_slopes(self.times, self.rears, period)
+        self.make_table()
+
+    def get_spline_value(self, t, values, slopes):
+        n = len(self.times)
+        t = t % self.period
+        i = bisect.bisect_right(self.times, t) - 1
+        if i < 0:
+            # before the first control point, on the segment from the last one round to the first
+            i = n - 1
+            t += self.period
+        t0 = self.times[i]
+        t1 = self.times[i + 1] if i + 1 < n else self.times[0] + self.period
+        h = t1 - t0
+        s = (t - t0) / h
+        s2 = s * s
+        s3 = s2 * s
+        j = (i + 1) % n
+        return (2.0 * s3 - 3.0 * s2 + 1.0) * values[i] + (s3 - 2.0 * s2 + s) * h * slopes[i] + (3.0 * s2 - 2.0 * s3) * values[j] + (s3 - s2) * h * slopes[j]
+
+    def get_spline_lengths(self, t):
+        # worked out from the control points, without the table
+        return self.get_spline_value(t, self.fronts, self.front_slopes), self.get_spline_value(t, self.rears, self.rear_slopes)
+
+    def make_table(self):
+        self.table_size = max(int(self.period * self.table_rate + 0.5), len(self.times))
+        self.table_scale = self.table_size / self.period
+        self.front_table = []
+        self.rear_table = []
+        for k in range(self.table_size + 1):
+            front, rear = self.get_spline_lengths(k / self.table_scale)
+            self.front_table.append(front)
+            self.rear_table.append(rear)
+
+    def get_lengths(self, t):
+        # front and rear lengths t seconds into the schedule, any t
+        u = (t % self.period) * self.table_scale
+        i = int(u)
+        if i >= self.table_size:
+            i = self.table_size - 1
+        f = u - i
+        front_table = self.front_table
+        rear_table = self.rear_table
+        return front_table[i] + (front_table[i + 1] - front_table[i]) * f, rear_table[i] + (rear_table[i + 1] - rear_table[i]) * f
+
+    def get_max_error(self, samples, sample_dt):
+        # the furthest the table is from any of samples, a sample every sample_dt from time 0
+        worst = 0.0
+        for k in range(len(samples)):
+            lengths = self.get_lengths(k * sample_dt)
+            for c in range(2):
+                worst = max(worst, abs(lengths[c] - samples[k][c]))
+        return worst
+
+    def to_dict(self):
+        return {'period':self.period, 'times':self.times, 'lengths':self.lengths, 'table_rate':self.table_rate}
+
+    @staticmethod
+    def from_dict(d):
+        return LineSchedule(d['times'], d['lengths'], d['period'], d.get('table_rate', default_table_rate))
+
+def from_samples(samples, sample_dt = default_sample_dt, tolerance = default_tolerance, table_rate = default_table_rate):
+    # a schedule through as few of samples as keeps the curves within tolerance of all of them
+    # starts with a few control points, then adds the worst sample in each segment that is out
+    n = len(samples)
+    if n < 3:
+        raise ScheduleError('too few samples to make a schedule from')
+    period = n * sample_dt
+    indices = [0, n // 3, (2 * n) // 3]
+    while True:
+        schedule = LineSchedule([i * sample_dt for i in indices], [samples[i] for i in indices], period, table_rate)
+        added = []
+        for segment in range(len(indices)):
+            start = indices[segment]
+            end = indices[segment + 1] if segment + 1 < len(indices) else n
+            worst = tolerance
+            worst_index = None
+            for k in range(start + 1, end):
+                front, rear = schedule.get_spline_lengths(k * sample_dt)
+                error = max(abs(front - samples[k][0]), abs(rear - samples[k][1]))
+                if error > worst:
+                    worst = error
+                    worst_index = k
+            if worst_index is not None:
+                added.append(worst_index)
+        if len(added) == 0:
+            return schedule
+        indices = sorted(indices + added)
+
+def save(path, schedule):
+    f = open(path, 'w')
+    json.dump(schedule.to_dict(), f, indent = 1)
+    f.close()
+
+def load(path):
+    f = open(path, 'r')
+    d = json.load(f)
+    f.close()
+    return LineSchedule.from_dict(d)
+
+def compare_rates(line_schedule, sim_mode, seconds, rates):
+    # flies the schedule at each physics rate, to show the curve no longer depends on the step
+    import simulation
+    for rate in rates:
+        config = simulation.Config(sim_mode, dt = 1.0 / rate, line_schedule = line_schedule)
+        sim = simulation.Simulation(config)
+        sim.step(int(round(seconds * rate)))
+        print('  %4d Hz: height %7.2f m, distance %8.1f m' % (rate, sim.get_height(), sim.get_distance()))
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Make a time based line length schedule from a points file')
+    parser.add_argument('points', nargs = '?', default = 'line_lengths.points')
+    parser.add_argument('output', nargs = '?', default = 'line_lengths.schedule')
+    parser.add_argument('--cycle-length', type = int, default = 251, help = 'samples in one cycle of the points file')
+    parser.add_argument('--tolerance', type = float, default = default_tolerance, help = 'metres')
+    parser.add_argument('--fly', type = float, default = 0.0, help = 'then fly it for this many seconds at 60, 120 and 240 Hz')
+    args = parser.parse_args()
+
+    samples = pointsfile.load(args.points)[:args.cycle_length]
+    sample_dt = pointsfile.load_timestep(args.points)
+    line_schedule = from_samples(samples, sample_dt, args.tolerance)
+    save(args.output, line_schedule)
+    print('%d samples to %d control points, within %.4f m of every sample, written to %s' % (len(samples), len(line_schedule.times), line_schedule.get_max_error(samples, sample_dt), args.output))
+    if args.fly > 0.0:
+        compare_rates(line_schedule, 'flapping', args.fly, [60, 120, 240])
+
+if __name__ == '__main__':
+    main()
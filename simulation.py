@@ -0,0 +1,626 @@
+import bisect
+import math
+import os
+import time
+
+import pymunk
+from pymunk.vec2d import Vec2d
+
+import pointsfile
+import schedule
+import terrain
+import winchcontrol
+
+# headless paraglider physics, no pygame needed
+# game.py draws a Simulation, batch tools just step it
+
+class Config:
+    def __init__(self, sim_mode = 'flapping', **kwargs):
+        self.sim_mode = sim_mode
+        self.dt = 1.0 / 60
+        self.gravity = (0.0, -9.8)
+        self.winch_length = 10.0 # used if winch
+        self.winch = False
+        self.start_frame = 106
+        self.points_file = 'line_lengths.points'
+        self.line_wave_lengths = None # list of (front, rear), read from points_file if None
+        self.line_wave_cycle_length = 251
+        self.line_schedule = None # a schedule.LineSchedule, or its to_dict, used instead of the per step curves if set
+        self.schedule_file = None # read into line_schedule if set
+        self.start_time = None # seconds into line_schedule to start at; start_frame steps of 1/60 s if None
+        self.terrain_file = None # json [x, y] points for the height of the ground, see terrain.Profile
+        self.terrain_hills = 0.0 # metres, the highest generated hills if no terrain_file; flat ground if 0
+        self.terrain_hill_length = 300.0 # metres, roughly the distance between hills
+        self.terrain_seed = 0
+        self.terrain_chunk_length = 100.0 # metres of ground added to or removed from the space at once
+        self.winch_controller = False # steer and change speed with the left and right winches, see winchcontrol.py
+
+        if sim_mode == 'gliding':
+            self.start_height = 20
+            self.line_wave = False
+            self.brake_angle = 0.2
+            self.start_v = (-7,0.0)
+            self.lines_use_slide_joints = True
+            self.pilot_runs = False
+        elif sim_mode == 'flapping':
+            self.start_height = 0.3
+            self.line_wave = True
+            self.brake_angle = 0.2
+            self.start_v = (-11,0.0)
+            self.lines_use_slide_joints = False
+            self.pilot_runs = True
+        else:
+            raise ValueError('unknown sim_mode: ' + str(sim_mode))
+
+        for key, value in kwargs.items():
+            if not hasattr(self, key):
+                raise AttributeError('unknown config setting: ' + key)
+            setattr(self, key, value)
+
+# files already read, path to ((modification time, size), curves), so a process making many simulations reads each once
+loaded_line_wave_lengths = {}
+
+def load_line_wave_lengths(path):
+    # text or binary points file; the curves returned may be shared, so shouldn't be changed
+    stat = os.stat(path)
+    key = (stat.st_mtime_ns, stat.st_size)
+    loaded = loaded_line_wave_lengths.get(path)
+    if loaded is not None and loaded[0] == key:
+        return loaded[1]
+    lengths = pointsfile.load(path)
+    loaded_line_wave_lengths[path] = (key, lengths)
+    return lengths
+
+class Graph:
+    def __init__(self, pts):
+        # make sure pts is a list of (x,y) points always increasing in x
+        self.pts = pts
+        self.xs = [pt[0] for pt in pts]
+        self.ys = [pt[1] for pt in pts]
+        self.last = len(pts) - 1
+        self.xs_array = None
+        self.ys_array = None
+
+    def get_y_at_x(self, x):
+        # y at the first or last point outside the range of x, straight line between points inside it
+        i = bisect.bisect_right(self.xs, x)
+        if i == 0:
+            return self.ys[0]
+        if i > self.last:
+            return self.ys[self.last]
+        x0 = self.xs[i-1]
+        y0 = self.ys[i-1]
+        return y0 + (x-x0)/(self.xs[i]-x0)*(self.ys[i]-y0)
+
+    def get_y_at_x_array(self, x):
+        # get_y_at_x for a whole numpy array of x values at once, giving the same values
+        import numpy
+        if self.xs_array is None:
+            self.xs_array = numpy.array(self.xs, dtype = float)
+            self.ys_array = numpy.array(self.ys, dtype = float)
+        xs = self.xs_array
+        ys = self.ys_array
+        x = numpy.asarray(x, dtype = float)
+        i = numpy.searchsorted(xs, x, side = 'right')
+        i1 = numpy.clip(i, 1, self.last)
+        x0 = xs[i1-1]
+        y0 = ys[i1-1]
+        with numpy.errstate(invalid = 'ignore'):
+            y = y0 + (x-x0)/(xs[i1]-x0)*(ys[i1]-y0)
+        y = numpy.where(i == 0, ys[0], y)
+        return numpy.where(i > self.last, ys[self.last], y)
+
+class GameBody():
+    def __init__(self, sim, pos, v, mass, poly_pts):
+        self.sim = sim
+        self.body = pymunk.Body()
+        self.body.position = pos
+        self.body.velocity = v
+        self.shape = pymunk.Poly(self.body, poly_pts)
+        self.shape.mass = mass
+        self.shape.friction = 0.7
+        sim.space.add(self.body, self.shape)
+
+    def apply_parasitic_drag(self, coefficient):
+        v, v_magn = self.body.velocity.normalized_and_length()
+        drag = 1.0 * v_magn * v_magn * coefficient
+        world_pos = self.body.local_to_world((0,0))
+        self.body.apply_force_at_world_point(-v * drag, world_pos)
+
+class Wing(GameBody):
+    def __init__(self, sim, alt):
+        poly_pts = [(0.635, -2.667),(-0.048, -2.556),(-0.841, -1.619),(-1.317, 0.698),(-0.984, 0.841),(1.349, 0.254),(1.016, -1.381)]
+        GameBody.__init__(self, sim, (0,alt), sim.config.start_v, 4, poly_pts)
+        self.body.angle = 0.3
+        self.airflow = Vec2d(0,0)
+        self.lift = Vec2d(0,0)
+        self.drag = Vec2d(0,0)
+        self.pressure_pos = 0
+        self.lift_coefficients = Graph([(-100, 0), (-30, -0.5), (-10, -0.5), (-8, -0.4), (-6, -0.2), (-4, 0), (-2, 0.2), (0, 0.42), (2, 0.66), (4, 0.82), (6, 1.1), (8, 1.2), (10, 1.4), (12, 1.45), (14, 1.52), (16, 1.5), (18, 1.45), (30, 1.4), (100, 0)])
+        self.drag_coefficients = Graph([(-30,0.3),(-10, 0.1), (0, 0.07), (8, 0.1), (12, 0.14), (15, 0.25), (18, 0.45)])
+        self.pressure_posns = Graph([(-10, 0), (0, 0.0)])
+        self.angle_of_attack = None
+        self.angle_of_wing = None
+        self.brake = False
+        self.let_up = False
+        # list of (front line length, rear line legnth)
+        self.line_wave_lengths = sim.line_wave_lengths
+
+    def get_lift_coefficient(self, angle):
+        return self.lift_coefficients.get_y_at_x(angle)
+
+    def get_drag_coefficient(self, angle):
+        return self.drag_coefficients.get_y_at_x(angle) * 1.1
+
+    def get_pressure_pos(self, angle):
+        return self.pressure_posns.get_y_at_x(angle)
+
+    def get_front_length(self, frame):
+        return self.line_wave_lengths[frame][0]
+
+    def get_rear_length(self, frame):
+        return self.line_wave_lengths[frame][1]
+
+    def apply_force(self):
+        sim = self.sim
+        config = sim.config
+        self.angle_of_wing = self.body.angle - 3.1
+        if self.brake:
+            self.angle_of_wing -= config.brake_angle
+        elif self.let_up:
+            self.angle_of_wing += config.brake_angle
+
+        v, v_magn = self.body.velocity.normalized_and_length()
+        angle_of_airflow = math.atan2(v.y, v.x)
+        self.angle_of_attack = (angle_of_airflow - self.angle_of_wing) * 57
+        if self.angle_of_attack > 180: self.angle_of_attack -= 360
+        elif self.angle_of_attack < -180: self.angle_of_attack += 360
+
+        # assuming lift is about 1000Nm ( 100kg ) at 10 m/s
+        lift = 16.0 * v_magn * v_magn * self.get_lift_coefficient(self.angle_of_attack)
+        drag = 16.0 * v_magn * v_magn * self.get_drag_coefficient(self.angle_of_attack)
+
+        if config.lines_use_slide_joints:
+            if lift < -4000:
+                lift = -4000
+            if lift > 4000:
+                lift = 4000
+            if drag > 4000:
+                drag = 4000
+
+        self.lift = -v.perpendicular() * lift
+        self.drag = -v * drag
+
+        self.pressure_pos = self.get_pressure_pos(self.angle_of_attack)
+
+        world_pos = self.body.local_to_world((0,0))
+        self.body.apply_force_at_world_point(self.lift + self.drag, world_pos)
+
+        if sim.thrust_on_wing:
+            # 20 kg to the left
+            world_pos = self.body.local_to_world((0,0))
+            self.body.apply_force_at_world_point(Vec2d(-20 * 9.8, 0), world_pos)
+
+        if sim.line_schedule is not None and sim.line_wave:
+            # up and down, line_wave_time in seconds
+            front_length, rear_length = sim.line_schedule.get_lengths(sim.line_wave_time)
+            sim.set_line_lengths(front_length, rear_length)
+
+            sim.line_wave_time += config.dt
+            if sim.line_wave_time >= sim.line_schedule.period:
+                sim.line_wave_time -= sim.line_schedule.period
+                if sim.next_line_wave_lengths is not None:
+                    sim.swap_line_wave_lengths()
+        elif sim.line_wave:
+            # up and down
+            front_length, rear_length = self.line_wave_lengths[sim.line_wave_time]
+            sim.set_line_lengths(front_length, rear_length)
+
+            sim.line_wave_time += 1
+            if sim.line_wave_time >= config.line_wave_cycle_length:
+                sim.line_wave_time = 0
+                if sim.next_line_wave_lengths is not None:
+                    sim.swap_line_wave_lengths()
+
+class Centre(GameBody):
+    def __init__(self, sim, alt):
+        poly_pts = [(-0.005, -0.005), (-0.005, 0.005), (0.005, 0.005), (0.005, -0.005)]
+        GameBody.__init__(self, sim, (0,alt), sim.config.start_v, 3, poly_pts)
+
+    def apply_force(self):
+        self.apply_parasitic_drag(0.1)
+
+class Damper(GameBody):
+    def __init__(self, sim, wing, pos_on_wing):
+        self.wing = wing
+        world_pos = wing.body.local_to_world(pos_on_wing)
+        poly_pts = [(-0.05, -0.05), (-0.05, 0.05), (0.05, 0.05), (0.05, -0.05)]
+        GameBody.__init__(self, sim, world_pos + (0, -0.3), sim.config.start_v, 0.5, poly_pts)
+        self.damped_spring = pymunk.DampedSpring(wing.body, self.body, pos_on_wing, (0, 0), 0.3, 500, 0.3)
+        sim.space.add(self.damped_spring)
+
+class Pilot(GameBody):
+    def __init__(self, sim, starting_height):
+        poly_pts = [(0.302, 0.619),(-0.556, -0.0317),(-0.603, -0.714),(0.063, -0.460),(0.429, 0.222)]
+        GameBody.__init__(self, sim, (0,starting_height), sim.config.start_v, 85, poly_pts)
+        self.winch_up = False
+        self.v_to_centre = None
+        self.dline = 0.0
+        if sim.config.pilot_runs:
+            self.shape.friction = 0.0
+
+    def apply_force(self):
+        if self.sim.thrust:
+            # 20 kg to the left
+            world_pos = self.body.local_to_world((0,0))
+            self.body.apply_force_at_world_point(Vec2d(-20 * 9.8, 0), world_pos)
+
+def get_body_state(body):
+    return {'position':list(body.position), 'angle':body.angle, 'velocity':list(body.velocity), 'angular_velocity':body.angular_velocity}
+
+def set_body_state(body, state):
+    # angle first, pymunk turns bodies about their centre of gravity
+    body.angle = state['angle']
+    body.position = state['position']
+    body.velocity = state['velocity']
+    body.angular_velocity = state['angular_velocity']
+
+# keys which change the physics, see Simulation.handle_key; the arrow keys move the winch controller's joystick
+input_keys = ['a', 'b', 'c', 'd', 'e', 'f', 'g', 'h'] + winchcontrol.joystick_keys
+
+# what input_log has in place of a key for new curves, with the curves, or a line schedule's to_dict, in place of down
+curves_event = 'curves'
+
+def get_curves_data(lengths):
+    # the curves or line schedule as plain python values, for a state or input_log
+    if isinstance(lengths, schedule.LineSchedule):
+        return lengths.to_dict()
+    return [list(p) for p in lengths]
+
+def make_curves(data):
+    # back from get_curves_data
+    if isinstance(data, dict):
+        return schedule.LineSchedule.from_dict(data)
+    return data
+
+class Simulation:
+    # body classes, game.py swaps in ones that can draw themselves
+    wing_class = Wing
+    pilot_class = Pilot
+    centre_class = Centre
+
+    def __init__(self, config = None):
+        if config is None:
+            config = Config()
+        self.config = config
+        self.space = pymunk.Space()
+        self.space.gravity = config.gravity
+        self.line_wave = config.line_wave
+        self.line_wave_time = config.start_frame
+        self.thrust = False
+        self.thrust_on_wing = False
+        self.steps = 0
+        self.step_listeners = [] # called with the simulation after every space.step
+        self.input_log = None # set to a list to have handle_key add [steps, key, down] to it, and new curves [steps, curves_event, curves]
+        self.profiler = None # set to a profiler.PhaseProfiler to time the parts of each step
+
+        self.line_schedule = config.line_schedule
+        if isinstance(self.line_schedule, dict):
+            self.line_schedule = schedule.LineSchedule.from_dict(self.line_schedule)
+        if self.line_schedule is None and config.schedule_file is not None:
+            self.line_schedule = schedule.load(config.schedule_file)
+        if self.line_schedule is not None:
+            self.line_wave_time = self.get_start_time()
+            self.line_wave_lengths = None
+        else:
+            self.line_wave_lengths = config.line_wave_lengths
+            if self.line_wave_lengths is None:
+                self.line_wave_lengths = load_line_wave_lengths(config.points_file)
+            if config.line_wave_cycle_length > len(self.line_wave_lengths):
+                raise ValueError('line_wave_cycle_length is longer than the line length curve')
+        self.next_line_wave_lengths = None # swapped in at the start of the next cycle
+
+        # the ground, chunks of it added and removed around the pilot as it flies
+        self.terrain = terrain.Terrain(self.space, terrain.make_ground(config), config.terrain_chunk_length)
+
+        start_height = config.start_height
+        self.centre = None
+        self.drop_line = None
+        if config.winch:
+            winch_length = config.winch_length
+            self.wing = self.wing_class(self, start_height + 6 + winch_length * 2)
+            self.centre = self.centre_class(self, start_height + winch_length * 2)
+            self.pilot = self.pilot_class(self, start_height-0.2 + winch_length)
+            line_attacher = self.centre
+            if config.lines_use_slide_joints:
+                self.drop_line = pymunk.SlideJoint(self.centre.body, self.pilot.body, (0, 0), (0.0, 0.2), 0.01, winch_length)
+            else:
+                self.drop_line = pymunk.PinJoint(self.centre.body, self.pilot.body, (0, 0), (0.0, 0.2))
+            self.space.add(self.drop_line)
+            attacher_point = (0.0, 0.0)
+        else:
+            self.wing = self.wing_class(self, start_height + 6)
+            self.pilot = self.pilot_class(self, start_height-0.2)
+            line_attacher = self.pilot
+            attacher_point = (0.0, 0.2)
+
+        if self.line_schedule is not None:
+            front_length, rear_length = self.line_schedule.get_lengths(self.line_wave_time)
+        else:
+            front_length, rear_length = self.line_wave_lengths[config.start_frame]
+        self.front_length = front_length
+        self.rear_length = rear_length
+
+        if config.lines_use_slide_joints:
+            self.front_line = pymunk.SlideJoint(self.wing.body, line_attacher.body, (-1.3, 0), attacher_point, 0.05, front_length)
+            self.rear_line = pymunk.SlideJoint(self.wing.body, line_attacher.body, (1.4, 0), attacher_point, 0.05, rear_length)
+        else:
+            self.front_line = pymunk.PinJoint(self.wing.body, line_attacher.body, (-1.3, 0), attacher_point)
+            self.front_line.distance = front_length
+            self.rear_line = pymunk.PinJoint(self.wing.body, line_attacher.body, (1.4, 0), attacher_point)
+            self.rear_line.distance = rear_length
+        self.space.add(self.front_line, self.rear_line)
+        self.terrain.update(self.pilot.body.position.x)
+
+        self.winch_controller = None
+        if config.winch_controller:
+            self.winch_controller = winchcontrol.WinchController(self)
+
+    def get_line_length(self, line):
+        if line is None:
+            return None
+        if self.config.lines_use_slide_joints:
+            return line.max
+        return line.distance
+
+    def set_line_lengths(self, front_length, rear_length):
+        self.front_length = front_length
+        self.rear_length = rear_length
+        self.set_joint_lengths(front_length, rear_length)
+
+    def set_joint_lengths(self, front_length, rear_length):
+        # just the lines in the space, front_length and rear_length stay as the base the winch controller adjusts
+        if self.rear_line is not None:
+            if self.config.lines_use_slide_joints:
+                self.rear_line.max = rear_length
+            else:
+                self.rear_line.distance = rear_length
+        if self.front_line is not None:
+            if self.config.lines_use_slide_joints:
+                self.front_line.max = front_length
+            else:
+                self.front_line.distance = front_length
+
+    def cut_front_line(self):
+        if self.front_line is not None:
+            self.space.remove(self.front_line)
+            self.front_line = None
+
+    def cut_rear_line(self):
+        if self.rear_line is not None:
+            self.space.remove(self.rear_line)
+            self.rear_line = None
+
+    def get_start_time(self):
+        if self.config.start_time is not None:
+            return self.config.start_time
+        return self.config.start_frame * schedule.default_sample_dt
+
+    def toggle_line_wave(self):
+        self.line_wave = not self.line_wave
+        self.line_wave_time = self.config.start_frame
+        if self.line_schedule is not None:
+            self.line_wave_time = self.get_start_time()
+        if self.next_line_wave_lengths is not None:
+            self.swap_line_wave_lengths()
+
+    def prepare_line_wave_lengths(self, lengths):
+        # checks new curves, and if this flies a line schedule, fits one to them, which takes a good part of a second
+        # it doesn't change the simulation, so it can be done on another thread than the one stepping it
+        if self.config.line_wave_cycle_length > len(lengths):
+            raise ValueError('line_wave_cycle_length is longer than the line length curve')
+        if self.line_schedule is not None:
+            return schedule.from_samples(lengths[:self.config.line_wave_cycle_length])
+        return lengths
+
+    def set_next_line_wave_lengths(self, lengths):
+        # new curves, used from the start of the next cycle so no cycle is part one curve and part another
+        # lengths can be what prepare_line_wave_lengths made of them already
+        if isinstance(lengths, schedule.LineSchedule):
+            if self.line_schedule is None:
+                raise ValueError('a line schedule can only replace a line schedule')
+        else:
+            lengths = self.prepare_line_wave_lengths(lengths)
+        if self.input_log is not None:
+            self.input_log.append([self.steps, curves_event, get_curves_data(lengths)])
+        self.next_line_wave_lengths = lengths
+        if not self.line_wave:
+            self.swap_line_wave_lengths()
+
+    def swap_line_wave_lengths(self):
+        if self.line_schedule is not None:
+            self.line_schedule = self.next_line_wave_lengths
+        else:
+            self.line_wave_lengths = self.next_line_wave_lengths
+            self.wing.line_wave_lengths = self.line_wave_lengths
+        self.next_line_wave_lengths = None
+
+    def handle_key(self, key, down):
+        # key is a pygame key name, like 'a', so inputs can be recorded and replayed without pygame
+        # returns False for keys which don't change the physics
+        if key not in input_keys:
+            return False
+        if self.input_log is not None:
+            self.input_log.append([self.steps, key, down])
+        if key in winchcontrol.joystick_keys:
+            if self.winch_controller is not None:
+                self.winch_controller.set_key(key, down)
+        elif down:
+            if key == 'a':
+                self.cut_front_line()
+            elif key == 'b':
+                self.cut_rear_line()
+            elif key == 'c':
+                self.thrust = not self.thrust
+            elif key == 'd':
+                self.wing.brake = True
+            elif key == 'e':
+                self.pilot.winch_up = True
+            elif key == 'f':
+                self.wing.let_up = True
+            elif key == 'g':
+                self.thrust_on_wing = not self.thrust_on_wing
+            elif key == 'h':
+                self.toggle_line_wave()
+        else:
+            if key == 'd':
+                self.wing.brake = False
+            elif key == 'e':
+                self.pilot.winch_up = False
+            elif key == 'f':
+                self.wing.let_up = False
+        return True
+
+    def get_state(self):
+        # everything needed to carry on from here, as plain python values
+        config = dict(self.config.__dict__)
+        if self.line_schedule is not None:
+            config['line_schedule'] = self.line_schedule.to_dict()
+            config['schedule_file'] = None
+        else:
+            config['line_wave_lengths'] = [list(p) for p in self.line_wave_lengths]
+        return {
+            'config':config,
+            'steps':self.steps,
+            'line_wave':self.line_wave,
+            'line_wave_time':self.line_wave_time,
+            'thrust':self.thrust,
+            'thrust_on_wing':self.thrust_on_wing,
+            'brake':self.wing.brake,
+            'let_up':self.wing.let_up,
+            'winch_up':self.pilot.winch_up,
+            'wing':get_body_state(self.wing.body),
+            'pilot':get_body_state(self.pilot.body),
+            'centre':None if self.centre is None else get_body_state(self.centre.body),
+            'front_length':self.front_length,
+            'rear_length':self.rear_length,
+            'front_line':self.get_line_length(self.front_line),
+            'rear_line':self.get_line_length(self.rear_line),
+            'drop_line':self.get_line_length(self.drop_line),
+            'angle_of_attack':self.wing.angle_of_attack,
+            'angle_of_wing':self.wing.angle_of_wing,
+            'lift':list(self.wing.lift),
+            'drag':list(self.wing.drag),
+            'pressure_pos':self.wing.pressure_pos,
+            'winch_controller':None if self.winch_controller is None else self.winch_controller.get_state(),
+            'next_curves':None if self.next_line_wave_lengths is None else get_curves_data(self.next_line_wave_lengths),
+            }
+
+    def set_state(self, state):
+        # the simulation must have been made with the same config, see make_from_state
+        # pymunk doesn't let us set its solver's remembered impulses, so carrying on from here is very
+        # slightly different to carrying on from where the state was got, but it is the same every time
+        self.steps = state['steps']
+        self.line_wave = state['line_wave']
+        self.line_wave_time = state['line_wave_time']
+        self.thrust = state['thrust']
+        self.thrust_on_wing = state['thrust_on_wing']
+        self.wing.brake = state['brake']
+        self.wing.let_up = state['let_up']
+        self.pilot.winch_up = state['winch_up']
+        set_body_state(self.wing.body, state['wing'])
+        set_body_state(self.pilot.body, state['pilot'])
+        if self.centre is not None:
+            set_body_state(self.centre.body, state['centre'])
+        if state['front_line'] is None:
+            self.cut_front_line()
+        if state['rear_line'] is None:
+            self.cut_rear_line()
+        self.set_line_lengths(state['front_line'], state['rear_line'])
+        self.front_length = state['front_length']
+        self.rear_length = state['rear_length']
+        if self.drop_line is not None:
+            if self.config.lines_use_slide_joints:
+                self.drop_line.max = state['drop_line']
+            else:
+                self.drop_line.distance = state['drop_line']
+        self.wing.angle_of_attack = state['angle_of_attack']
+        self.wing.angle_of_wing = state['angle_of_wing']
+        self.wing.lift = Vec2d(*state['lift'])
+        self.wing.drag = Vec2d(*state['drag'])
+        self.wing.pressure_pos = state['pressure_pos']
+        self.terrain.update(self.pilot.body.position.x)
+        if self.winch_controller is not None and state.get('winch_controller') is not None:
+            self.winch_controller.set_state(state['winch_controller'])
+        if state.get('next_curves') is not None:
+            self.next_line_wave_lengths = make_curves(state['next_curves'])
+
+    def step(self, n = 1):
+        if self.profiler is not None:
+            self.step_profiled(n)
+            return
+        wing = self.wing
+        pilot = self.pilot
+        space = self.space
+        dt = self.config.dt
+        listeners = self.step_listeners
+        pilot_body = pilot.body
+        update_terrain = self.terrain.update
+        controller = self.winch_controller
+        for i in range(n):
+            wing.apply_force()
+            if controller is not None:
+                controller.tick()
+            pilot.apply_force()
+            space.step(dt)
+            update_terrain(pilot_body.position.x)
+            self.steps += 1
+            for listener in listeners:
+                listener(self)
+
+    def step_profiled(self, n):
+        # the same as step, timing each call
+        wing = self.wing
+        pilot = self.pilot
+        space = self.space
+        dt = self.config.dt
+        listeners = self.step_listeners
+        pilot_body = pilot.body
+        update_terrain = self.terrain.update
+        controller = self.winch_controller
+        profiler = self.profiler
+        for i in range(n):
+            t = time.perf_counter()
+            wing.apply_force()
+            t = profiler.lap('Wing.apply_force', t)
+            if controller is not None:
+                controller.tick()
+                t = profiler.lap('winch controller', t)
+            pilot.apply_force()
+            t = profiler.lap('Pilot.apply_force', t)
+            space.step(dt)
+            t = profiler.lap('space.step', t)
+            update_terrain(pilot_body.position.x)
+            t = profiler.lap('terrain', t)
+            self.steps += 1
+            for listener in listeners:
+                listener(self)
+            if len(listeners) > 0:
+                profiler.lap('step listeners', t)
+
+    def get_height(self):
+        return self.pilot.body.position.y
+
+    def get_distance(self):
+        return math.fabs(self.pilot.body.position.x)
+
+    def get_airspeed(self):
+        return abs(self.wing.body.velocity)
+
+def make_from_state(state, simulation_class = Simulation):
+    # a new simulation carrying on from a state got with get_state
+    settings = dict(state['config'])
+    sim_mode = settings.pop('sim_mode')
+    sim = simulation_class(Config(sim_mode, **settings))
+    sim.set_state(state)
+    return sim
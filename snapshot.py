@@ -0,0 +1,136 @@
+import argparse
+import hashlib
+import json
+import struct
+import time
+
+import simulation
+
+# saving a simulation part way through a flight, and recording and replaying key presses
+# snapshots are json; python writes floats so they read back exactly, so a restored simulation
+# starts from exactly the saved positions and velocities
+# a replay file is a starting state, the key presses and new curves with the step they happened at, and a hash of
+# the wing and pilot positions after every step, so replaying it can check it flew exactly the same
+
+def save_state(path, state):
+    f = open(path, 'w')
+    json.dump(state, f)
+    f.close()
+
+def load_state(path):
+    f = open(path, 'r')
+    state = json.load(f)
+    f.close()
+    return state
+
+def save_snapshot(sim, path):
+    save_state(path, sim.get_state())
+
+def load_snapshot(path, simulation_class = simulation.Simulation):
+    return simulation.make_from_state(load_state(path), simulation_class)
+
+def run_to_snapshot(config, steps, path):
+    # fly a new simulation for steps, say past the take off run, and save where it got to
+    sim = simulation.Simulation(config)
+    sim.step(steps)
+    save_snapshot(sim, path)
+    return sim
+
+class TrajectoryHash:
+    # hashes the wing and pilot position and angle after every step
+    def __init__(self, sim):
+        self.sha = hashlib.sha256()
+        self.steps = 0
+        sim.step_listeners.append(self.update)
+
+    def update(self, sim):
+        wing = sim.wing.body
+        pilot = sim.pilot.body
+        self.sha.update(struct.pack('<6d', wing.position.x, wing.position.y, wing.angle, pilot.position.x, pilot.position.y, pilot.angle))
+        self.steps += 1
+
+    def hexdigest(self):
+        return self.sha.hexdigest()
+
+class ReplayRecorder:
+    # records the key presses handled by sim.handle_key, and the curves given to sim.set_next_line_wave_lengths, from now on
+    # sim must be new, or just made with make_from_state, for the replay to fly exactly the same, as
+    # pymunk remembers impulses from the last step which a saved state can't hold
+    def __init__(self, sim):
+        self.sim = sim
+        self.start = sim.get_state()
+        self.events = []
+        sim.input_log = self.events
+        self.hash = TrajectoryHash(sim)
+
+    def get_replay(self):
+        return {
+            'start':self.start,
+            'events':self.events,
+            'steps':self.sim.steps,
+            'trajectory_hash':self.hash.hexdigest(),
+            'end':self.sim.get_state(),
+            }
+
+    def save(self, path):
+        save_state(path, self.get_replay())
+
+def replay(replay_data, simulation_class = simulation.Simulation):
+    # runs a recorded replay, returns the simulation and a list of what didn't match ( empty if it all did )
+    sim = simulation.make_from_state(replay_data['start'], simulation_class)
+    trajectory_hash = TrajectoryHash(sim)
+    events = replay_data['events']
+    end_step = replay_data['steps']
+    i = 0
+    while True:
+        # a key pressed at a step was handled before that step was run, as in the game loop
+        while i < len(events) and events[i][0] == sim.steps:
+            if events[i][1] == simulation.curves_event:
+                sim.set_next_line_wave_lengths(simulation.make_curves(events[i][2]))
+            else:
+                sim.handle_key(events[i][1], events[i][2])
+            i += 1
+        if sim.steps >= end_step:
+            break
+        if i < len(events):
+            sim.step(min(events[i][0], end_step) - sim.steps)
+        else:
+            sim.step(end_step - sim.steps)
+
+    mismatches = []
+    if i != len(events):
+        mismatches.append('%d events were not replayed' % (len(events) - i))
+    if trajectory_hash.hexdigest() != replay_data['trajectory_hash']:
+        mismatches.append('trajectory hash differs')
+    end = json.loads(json.dumps(sim.get_state()))
+    for key, value in replay_data['end'].items():
+        if end[key] != value:
+            mismatches.append(key + ' differs: ' + repr(end[key]) + ' != ' + repr(value))
+    return sim, mismatches
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Save a mid-flight snapshot, or check a recorded replay flies exactly the same')
+    parser.add_argument('--mode', choices = ['gliding', 'flapping'], default = 'flapping')
+    parser.add_argument('--steps', type = int, help = 'fly this many steps and save a snapshot')
+    parser.add_argument('--snapshot', default = 'snapshot.json')
+    parser.add_argument('--replay', help = 'replay file to check')
+    args = parser.parse_args()
+
+    if args.replay:
+        start_time = time.perf_counter()
+        sim, mismatches = replay(load_state(args.replay))
+        print('replayed %d steps in %.2f s' % (sim.steps, time.perf_counter() - start_time))
+        for mismatch in mismatches:
+            print('  ' + mismatch)
+        if mismatches:
+            print('replay differs')
+            exit(1)
+        print('replay is bit-identical')
+    elif args.steps is not None:
+        sim = run_to_snapshot(simulation.Config(args.mode), args.steps, args.snapshot)
+        print('saved step %d at height %.2f m to %s' % (sim.steps, sim.get_height(), args.snapshot))
+    else:
+        parser.print_help()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+import argparse
+import itertools
+import multiprocessing
+import os
+import time
+
+import simulation
+
+# runs many headless simulations in parallel, one Simulation ( and so one pymunk Space ) per scenario
+# a scenario is a dict of Config settings, plus optional 'sim_mode' and 'cycles'
+
+default_cycles = 20
+
+def make_grid(**axes):
+    # make_grid(brake_angle = [0.1, 0.2], start_frame = [0, 106]) gives 4 scenarios
+    keys = list(axes.keys())
+    return [dict(zip(keys, values)) for values in itertools.product(*[axes[key] for key in keys])]
+
+def make_config(scenario):
+    settings = dict(scenario)
+    settings.pop('cycles', None)
+    sim_mode = settings.pop('sim_mode', 'flapping')
+    return simulation.Config(sim_mode, **settings)
+
+def run_scenario(scenario, cycles = None):
+    if cycles is None:
+        cycles = scenario.get('cycles', default_cycles)
+    start_time = time.perf_counter()
+    sim = simulation.Simulation(make_config(scenario))
+    # steps per flapping cycle; a line schedule has its own period in seconds
+    if sim.line_schedule is not None:
+        cycle_length = int(round(sim.line_schedule.period / sim.config.dt))
+    else:
+        cycle_length = sim.config.line_wave_cycle_length
+
+    # heights at the end of each flapping cycle
+    heights = [sim.get_height()]
+    for i in range(cycles):
+        sim.step(cycle_length)
+        heights.append(sim.get_height())
+
+    # the first cycle is the take off run, so leave it out of the climb rate if we can
+    climbs = [b - a for a, b in zip(heights[:-1], heights[1:])]
+    if len(climbs) > 1:
+        climbs = climbs[1:]
+
+    return {
+        'scenario':scenario,
+        'cycles':cycles,
+        'steps':sim.steps,
+        'final_height':sim.get_height(),
+        'max_height':max(heights),
+        'distance':sim.get_distance(),
+        'climb_per_cycle':sum(climbs) / len(climbs) if len(climbs) > 0 else 0.0,
+        'heights':heights,
+        'seconds':time.perf_counter() - start_time,
+        }
+
+def run_sweep(scenarios, processes = None, cycles = None):
+    # returns one result per scenario, in the same order as scenarios
+    scenarios = list(scenarios)
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = min(processes, len(scenarios))
+    if processes <= 1:
+        return [run_scenario(scenario, cycles) for scenario in scenarios]
+
+    jobs = [(scenario, cycles) for scenario in scenarios]
+    with multiprocessing.Pool(processes) as pool:
+        # chunksize 1 keeps the cores balanced, each scenario is far more work than the pickling
+        return pool.starmap(run_scenario, jobs, chunksize = 1)
+
+def print_results(results):
+    # only show the settings which differ between scenarios
+    keys = []
+    for result in results:
+        for key, value in result['scenario'].items():
+            if key not in keys and any(r['scenario'].get(key) != value for r in results):
+                keys.append(key)
+    for result in results:
+        name = ', '.join(key + '=' + str(result['scenario'].get(key)) for key in keys)
+        print('%-60s height %8.2f m  distance %8.1f m  climb %7.3f m/cycle' % (name, result['final_height'], result['distance'], result['climb_per_cycle']))
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Run a grid of headless ParaGame simulations in parallel')
+    parser.add_argument('--points', nargs = '+', default = ['line_lengths.points'], help = 'line length curve files to try')
+    parser.add_argument('--start-frame', type = int, nargs = '+', default = [106])
+    parser.add_argument('--start-v', type = float, nargs = '+', default = [-11.0], help = 'starting horizontal speed')
+    parser.add_argument('--brake-angle', type = float, nargs = '+', default = [0.2])
+    parser.add_argument('--slide-joints', type = int, nargs = '+', default = [0], help = '1 for slide joints, 0 for pin joints')
+    parser.add_argument('--cycle-length', type = int, nargs = '+', default = [251])
+    parser.add_argument('--cycles', type = int, default = default_cycles)
+    parser.add_argument('--processes', type = int, default = None)
+    args = parser.parse_args()
+
+    scenarios = make_grid(
+        points_file = args.points,
+        start_frame = args.start_frame,
+        start_v = [(v, 0.0) for v in args.start_v],
+        brake_angle = args.brake_angle,
+        lines_use_slide_joints = [bool(s) for s in args.slide_joints],
+        line_wave_cycle_length = args.cycle_length)
+
+    start_time = time.perf_counter()
+    results = run_sweep(scenarios, args.processes, args.cycles)
+    print_results(results)
+    print('%d scenarios in %.1f seconds' % (len(results), time.perf_counter() - start_time))
+
+if __name__ == '__main__':
+    main()
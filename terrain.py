@@ -0,0 +1,181 @@
+import bisect
+import json
+import math
+
+import pymunk
+
+# the ground, made in chunks along x as the glider flies, so it never runs out
+# only the chunks near the pilot are in the space, so the static shapes pymunk has to search, and the memory
+# they take, stay the same however far the flight goes; chunks left behind are taken out again
+# the height of the ground comes from a function of x: flat, generated hills, or a profile read from a file
+
+ground_radius = 0.05
+ground_friction = 1
+ground_elasticity = 1
+
+class Flat:
+    # the ground at y = 0 everywhere, as one segment per chunk
+    def get_height(self, x):
+        return 0.0
+
+    def is_flat(self):
+        return True
+
+class Hills:
+    # rolling hills up to height metres high, starting after flat_distance metres of level ground either side of x = 0
+    # a sum of sine waves with wavelengths around length metres, the same for the same seed
+    def __init__(self, height, length = 300.0, seed = 0, flat_distance = 300.0, ramp_distance = 300.0):
+        self.height = height
+        self.flat_distance = flat_distance
+        self.ramp_distance = ramp_distance
+        self.waves = []
+        for i in range(4):
+            # fixed but unrelated looking wavelengths and phases for each seed
+            u = math.sin((seed + 1) * 12.9898 + i * 78.233) * 43758.5453
+            u -= math.floor(u)
+            wavelength = length * (0.5 + i * 0.45 + 0.3 * u)
+            self.waves.append((2.0 * math.pi / wavelength, u * 2.0 * math.pi, 1.0 / (i + 1)))
+        self.scale = 1.0 / sum(wave[2] for wave in self.waves)
+
+    def get_height(self, x):
+        distance = math.fabs(x) - self.flat_distance
+        if distance <= 0.0:
+            return 0.0
+        ramp = min(distance / self.ramp_distance, 1.0)
+        y = 0.0
+        for k, phase, amplitude in self.waves:
+            y += amplitude * (1.0 + math.sin(k * distance + phase))
+        return self.height * ramp * y * self.scale * 0.5
+
+    def is_flat(self):
+        return self.height == 0.0
+
+class Profile:
+    # heights read from a json file of [x, y] points in increasing x, straight lines between them,
+    # level with the first or last point beyond them
+    def __init__(self, path):
+        f = open(path, 'r')
+        pts = json.load(f)
+        f.close()
+        if len(pts) < 1:
+            raise ValueError('no points in terrain file ' + path)
+        for i in range(1, len(pts)):
+            if pts[i][0] <= pts[i-1][0]:
+                raise ValueError('terrain points must increase in x: ' + path)
+        self.xs = [pt[0] for pt in pts]
+        self.ys = [pt[1] for pt in pts]
+
+    def get_height(self, x):
+        i = bisect.bisect_right(self.xs, x)
+        if i == 0:
+            return self.ys[0]
+        if i == len(self.xs):
+            return self.ys[-1]
+        x0 = self.xs[i-1]
+        y0 = self.ys[i-1]
+        return y0 + (x - x0) / (self.xs[i] - x0) * (self.ys[i] - y0)
+
+    def is_flat(self):
+        return min(self.ys) == max(self.ys) == 0.0
+
+def make_ground(config):
+    # the height function set up by a simulation.Config
+    if config.terrain_file is not None:
+        return Profile(config.terrain_file)
+    if config.terrain_hills > 0.0:
+        return Hills(config.terrain_hills, config.terrain_hill_length, config.terrain_seed)
+    return Flat()
+
+class Chunk:
+    def __init__(self, index, pts):
+        self.index = index
+        self.pts = pts # (x, y) along the top of the ground, from one end of the chunk to the other
+        self.body = None
+        self.shapes = []
+
+    def is_level(self):
+        y = self.pts[0][1]
+        for pt in self.pts:
+            if pt[1] != y:
+                return False
+        return True
+
+class Terrain:
+    # keeps the chunks within chunks_around of the one the pilot is over in space
+    def __init__(self, space, ground, chunk_length = 100.0, segment_length = 5.0, chunks_around = 2):
+        self.space = space
+        self.ground = ground
+        self.chunk_length = chunk_length
+        self.segments_per_chunk = 1 if ground.is_flat() else max(int(math.ceil(chunk_length / segment_length)), 1)
+        self.chunks_around = chunks_around
+        self.chunks = {} # index to Chunk, the ones in space
+        self.low_x = 0.0 # update does nothing until x leaves the chunk it was last over
+        self.high_x = -1.0
+        self.added = 0
+        self.removed = 0
+
+    def get_index(self, x):
+        # chunk 0 is centred on x = 0, so the glider doesn't start over a join
+        return int(math.floor(x / self.chunk_length + 0.5))
+
+    def get_chunk_start(self, index):
+        return (index - 0.5) * self.chunk_length
+
+    def get_chunk_points(self, index):
+        x0 = self.get_chunk_start(index)
+        n = self.segments_per_chunk
+        step = self.chunk_length / n
+        get_height = self.ground.get_height
+        return [(x0 + i * step, get_height(x0 + i * step)) for i in range(n + 1)]
+
+    def get_chunk(self, index):
+        # the chunk if it's in the space, or a new one not added to it, for drawing the ground away from the pilot
+        chunk = self.chunks.get(index)
+        if chunk is None:
+            chunk = Chunk(index, self.get_chunk_points(index))
+        return chunk
+
+    def add_chunk(self, index):
+        chunk = Chunk(index, self.get_chunk_points(index))
+        # each chunk has its own static body, as a body keeps every shape made on it even after they're out of the space
+        chunk.body = pymunk.Body(body_type = pymunk.Body.STATIC)
+        pts = chunk.pts
+        # the ends of the segments either side, which may be in the next chunks
+        step = self.chunk_length / self.segments_per_chunk
+        before = (pts[0][0] - step, self.ground.get_height(pts[0][0] - step))
+        after = (pts[-1][0] + step, self.ground.get_height(pts[-1][0] + step))
+        for i in range(len(pts) - 1):
+            seg = pymunk.Segment(chunk.body, pts[i], pts[i+1], ground_radius)
+            # so pymunk treats the joins between segments as smooth, and nothing catches on their rounded ends
+            seg.set_neighbors(pts[i-1] if i > 0 else before, pts[i+2] if i + 2 < len(pts) else after)
+            seg.friction = ground_friction
+            seg.elasticity = ground_elasticity
+            chunk.shapes.append(seg)
+        self.space.add(chunk.body, *chunk.shapes)
+        self.chunks[index] = chunk
+        self.added += 1
+
+    def remove_chunk(self, index):
+        chunk = self.chunks.pop(index)
+        self.space.remove(chunk.body, *chunk.shapes)
+        self.removed += 1
+
+    def update(self, x):
+        # call with the pilot's x after each step, cheap unless the pilot has moved onto another chunk
+        if self.low_x <= x < self.high_x:
+            return
+        index = self.get_index(x)
+        self.low_x = self.get_chunk_start(index)
+        self.high_x = self.low_x + self.chunk_length
+        # chunks go one further out than they come in, so flying back and forth over an edge doesn't keep rebuilding them
+        for i in [i for i in self.chunks if abs(i - index) > self.chunks_around + 1]:
+            self.remove_chunk(i)
+        for i in range(index - self.chunks_around, index + self.chunks_around + 1):
+            if i not in self.chunks:
+                self.add_chunk(i)
+
+    def get_height(self, x):
+        return self.ground.get_height(x)
+
+    def get_shape_count(self):
+        return sum(len(chunk.shapes) for chunk in self.chunks.values())
@@ -0,0 +1,148 @@
+import argparse
+import collections
+import multiprocessing
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import time
+
+# renders a flight to a video without a window, faster than real time
+# frames are drawn with game.py's own drawing into SDL's dummy video driver, copied out as bytes and
+# put on a bounded queue; a writer thread takes them off and pipes them to ffmpeg, which encodes in its
+# own process, or has a pool of processes save them as numbered .png files if there is no ffmpeg
+# so the physics and drawing of one frame overlap the encoding of the ones before
+
+def save_frame(frame_bytes, size, path):
+    # in a pool process, as compressing a png holds the GIL for a good while
+    import pygame
+    pygame.image.save(pygame.image.frombytes(frame_bytes, size, 'RGB'), path)
+
+class FrameWriter(threading.Thread):
+    def __init__(self, output, size, fps, max_queued = 8):
+        threading.Thread.__init__(self, daemon = True)
+        self.output = output
+        self.size = size
+        self.fps = fps
+        self.frames = queue.Queue(max_queued) # bounded, so drawing waits for the encoder rather than filling memory
+        self.count = 0
+        self.waits = 0
+        self.error = None
+        self.process = None
+        self.pool = None
+        self.ffmpeg = shutil.which('ffmpeg')
+        if self.ffmpeg is None or output.lower().endswith('.png'):
+            self.ffmpeg = None
+            # output is a pattern like frames/frame.png, numbered frames/frame_000000.png; always .png, as that's
+            # what they are, even if the output named a video for ffmpeg
+            self.image_pattern = os.path.splitext(output)[0] + '_%06d.png'
+            directory = os.path.dirname(output) or '.'
+            os.makedirs(directory, exist_ok = True)
+            self.pool = multiprocessing.Pool()
+            self.saving = collections.deque()
+            self.max_saving = max_queued
+        else:
+            self.process = subprocess.Popen([self.ffmpeg, '-loglevel', 'error', '-y',
+                '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', '%dx%d' % size, '-r', str(fps), '-i', '-',
+                '-c:v', 'libx264', '-preset', 'veryfast', '-pix_fmt', 'yuv420p', output], stdin = subprocess.PIPE)
+
+    def put(self, frame_bytes):
+        if self.frames.full():
+            self.waits += 1
+        self.frames.put(frame_bytes)
+
+    def run(self):
+        while True:
+            frame_bytes = self.frames.get()
+            if frame_bytes is None:
+                break
+            if self.error is not None:
+                continue
+            try:
+                if self.process is not None:
+                    self.process.stdin.write(frame_bytes)
+                else:
+                    path = self.image_pattern % self.count
+                    if len(self.saving) >= self.max_saving:
+                        self.saving.popleft().get()
+                    self.saving.append(self.pool.apply_async(save_frame, (frame_bytes, self.size, path)))
+                self.count += 1
+            except Exception as e:
+                self.error = e
+        if self.pool is not None:
+            try:
+                while len(self.saving) > 0:
+                    self.saving.popleft().get()
+            except Exception as e:
+                self.error = e
+            self.pool.close()
+            self.pool.join()
+
+    def finish(self):
+        self.frames.put(None)
+        self.join()
+        if self.process is not None:
+            self.process.stdin.close()
+            self.process.wait()
+        if self.error is not None:
+            raise self.error
+
+def get_steps_per_frame(fps, speed, dt):
+    # physics steps of dt seconds between video frames, for speed times real time at fps frames per second
+    # the frames have to fall on steps, so fps and speed have to give a whole number of steps
+    steps = speed / (fps * dt)
+    if steps < 0.5 or abs(steps - round(steps)) > 1e-6:
+        raise ValueError('%g times real time at %d fps is %g physics steps of %g s per frame, which needs to be a whole number' % (speed, fps, steps, dt))
+    return int(round(steps))
+
+def export(output, seconds, fps = 60, speed = 1, sim_mode = 'flapping', snapshot_file = None, max_queued = 8):
+    # speed is simulated seconds per second of video, so 1 is real time at any fps
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    import pygame
+    import game
+    import snapshot
+    game.sim_mode = sim_mode
+    if snapshot_file:
+        game.start_simulation(snapshot.load_state(snapshot_file))
+    else:
+        game.start_simulation()
+    game.sim.profiler = None
+    steps_per_frame = get_steps_per_frame(fps, speed, game.sim.config.dt)
+
+    screen = game.screen
+    writer = FrameWriter(output, screen.get_size(), fps, max_queued)
+    writer.start()
+    frame_count = int(round(seconds * fps))
+    start_time = time.perf_counter()
+    for i in range(frame_count):
+        game.sim.step(steps_per_frame)
+        game.draw_frame()
+        writer.put(pygame.image.tobytes(screen, 'RGB'))
+        if i % 60 == 0:
+            pygame.event.pump()
+    writer.finish()
+    elapsed = time.perf_counter() - start_time
+    return frame_count, elapsed, writer
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Render a flight to a video file without a window')
+    parser.add_argument('output', nargs = '?', default = 'flight.mp4', help = 'a video file for ffmpeg, or a .png name for numbered images')
+    parser.add_argument('--seconds', type = float, default = 60.0, help = 'length of the video')
+    parser.add_argument('--fps', type = int, default = 60)
+    parser.add_argument('--speed', type = float, default = 1.0, help = 'times real time; with --fps it has to give a whole number of physics steps per frame')
+    parser.add_argument('--mode', choices = ['gliding', 'flapping'], default = 'flapping')
+    parser.add_argument('--snapshot', help = 'start from this snapshot, see snapshot.py')
+    parser.add_argument('--queue', type = int, default = 8, help = 'frames waiting to be encoded at most')
+    args = parser.parse_args()
+
+    try:
+        frame_count, elapsed, writer = export(args.output, args.seconds, args.fps, args.speed, args.mode, args.snapshot, args.queue)
+    except ValueError as e:
+        parser.error(str(e))
+    video_seconds = frame_count / float(args.fps)
+    print('%d frames ( %.1f s of video ) in %.1f s, %.1fx real time, %s' % (frame_count, video_seconds, elapsed, video_seconds / elapsed, 'encoded with ffmpeg' if writer.ffmpeg else 'saved as ' + writer.image_pattern))
+    print('waited for the writer %d times' % writer.waits)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+import argparse
+import time
+
+import profiler
+
+# the computer driving separate left and right winches, as imagined in the README
+# every step it takes the base flapping lengths of the front and rear lines and works out a target for
+# each of the four winches from the pilot's stick and the state of the flight:
+#   stick forward pulls both front lines in, to fly faster; stick back pulls both rear lines in, to slow down
+#   stick sideways pulls one side's rear line in and lets the other out, to turn
+#   near the stall the rear lines are let back out, however far back the stick is
+# the adjustments move no faster than a winch can; the simulation is side on, so it flies each line at the
+# average of its left and right winches, and the difference between them only shows in the targets
+# each tick is timed against a latency budget, and the time between ticks against the step, into histograms
+
+joystick_keys = ['left', 'right', 'up', 'down']
+
+latency_edges = [0.000005, 0.00001, 0.00002, 0.00005, 0.0001, 0.0002, 0.0005, 0.001, 0.002, 0.005] # seconds
+jitter_edges = [0.0001, 0.0002, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.02] # seconds
+
+def move_towards(value, target, step):
+    if value < target:
+        return min(value + step, target)
+    return max(value - step, target)
+
+class SimulatedJoystick:
+    # a stand in for a real joystick, moved by the arrow keys
+    # the stick moves towards where the held keys push it at rate per second, and springs back to the centre when they're let go
+    def __init__(self, rate = 2.0):
+        self.rate = rate
+        self.held = dict((key, False) for key in joystick_keys)
+        self.x = 0.0 # -1 left to 1 right
+        self.y = 0.0 # -1 back to 1 forward
+
+    def set_key(self, key, down):
+        self.held[key] = down
+
+    def update(self, dt):
+        # moves the stick on by dt seconds, returns where it is
+        aim_x = float(self.held['right']) - float(self.held['left'])
+        aim_y = float(self.held['up']) - float(self.held['down'])
+        self.x = move_towards(self.x, aim_x, self.rate * dt)
+        self.y = move_towards(self.y, aim_y, self.rate * dt)
+        return self.x, self.y
+
+    def get_state(self):
+        return {'x':self.x, 'y':self.y, 'held':dict(self.held)}
+
+    def set_state(self, state):
+        self.x = state['x']
+        self.y = state['y']
+        self.held = dict(state['held'])
+
+class ScriptedJoystick(SimulatedJoystick):
+    # the stick moved by a function of the seconds since the start, returning (x, y), for testing without a window
+    def __init__(self, function):
+        SimulatedJoystick.__init__(self)
+        self.function = function
+        self.time = 0.0
+
+    def update(self, dt):
+        self.time += dt
+        self.x, self.y = self.function(self.time)
+        return self.x, self.y
+
+class WinchController:
+    def __init__(self, sim, joystick = None, speed_range = 0.1, steering_range = 0.1, max_winch_speed = 0.5,
+            stall_angle = 14.0, stall_release = 0.02, latency_budget = 0.0001):
+        self.sim = sim
+        self.joystick = SimulatedJoystick() if joystick is None else joystick
+        self.speed_range = speed_range # metres the front or rear lines are pulled in at full stick
+        self.steering_range = steering_range # metres between the left and right rear lines at full stick
+        self.max_winch_speed = max_winch_speed # metres per second, for the adjustments on top of the base curve
+        self.stall_angle = stall_angle # degrees of angle of attack
+        self.stall_release = stall_release # metres the rear lines are let out per degree past stall_angle
+        self.latency_budget = latency_budget # seconds a tick should take at most
+        self.period = None # seconds of real time expected between ticks, set to record the jitter
+        self.front_offset = 0.0 # metres added to both front lines
+        self.rear_offset = 0.0 # metres added to both rear lines
+        self.steering = 0.0 # metres the left rear line is longer than the right
+        self.targets = None # (left front, left rear, right front, right rear) lengths from the last tick
+        self.latency = profiler.Histogram(latency_edges)
+        self.jitter = profiler.Histogram(jitter_edges)
+        self.overruns = 0
+        self.last_tick_time = None
+
+    def tick(self):
+        # after Wing.apply_force has set the base lengths for this step
+        start_time = time.perf_counter()
+        sim = self.sim
+        dt = sim.config.dt
+        stick_x, stick_y = self.joystick.update(dt)
+
+        front_aim = -self.speed_range * stick_y if stick_y > 0.0 else 0.0
+        rear_aim = self.speed_range * stick_y if stick_y < 0.0 else 0.0
+        angle_of_attack = sim.wing.angle_of_attack
+        if angle_of_attack is not None and angle_of_attack > self.stall_angle:
+            rear_aim = min(rear_aim + self.stall_release * (angle_of_attack - self.stall_angle), 0.0)
+        steering_aim = self.steering_range * stick_x
+
+        max_change = self.max_winch_speed * dt
+        self.front_offset = move_towards(self.front_offset, front_aim, max_change)
+        self.rear_offset = move_towards(self.rear_offset, rear_aim, max_change)
+        self.steering = move_towards(self.steering, steering_aim, max_change)
+
+        front = sim.front_length + self.front_offset
+        rear = sim.rear_length + self.rear_offset
+        self.targets = (front, rear + self.steering * 0.5, front, rear - self.steering * 0.5)
+        # the average of each side
+        sim.set_joint_lengths(front, rear)
+
+        end_time = time.perf_counter()
+        latency = end_time - start_time
+        self.latency.add(latency)
+        if latency > self.latency_budget:
+            self.overruns += 1
+        if self.period is not None and self.last_tick_time is not None:
+            self.jitter.add(abs(start_time - self.last_tick_time - self.period))
+        self.last_tick_time = start_time
+
+    def set_key(self, key, down):
+        self.joystick.set_key(key, down)
+
+    def get_report_lines(self):
+        lines = self.latency.get_lines('winch tick latency')
+        lines.append('%d of %d ticks over the %.0f us budget' % (self.overruns, self.latency.count, 1e6 * self.latency_budget))
+        if self.jitter.count > 0:
+            lines += self.jitter.get_lines('winch tick jitter', 1e3, 'ms')
+        return lines
+
+    def get_state(self):
+        return {'joystick':self.joystick.get_state(), 'front_offset':self.front_offset, 'rear_offset':self.rear_offset, 'steering':self.steering}
+
+    def set_state(self, state):
+        self.joystick.set_state(state['joystick'])
+        self.front_offset = state['front_offset']
+        self.rear_offset = state['rear_offset']
+        self.steering = state['steering']
+
+# where main holds the stick for each 10 seconds, after the take off
+test_sticks = [(0.0, 0.0), (0.0, 0.0), (0.0, 0.0), (0.0, 1.0), (0.0, 0.0), (0.0, -1.0), (0.0, 0.0), (1.0, 0.0)]
+
+def test_stick(t):
+    return test_sticks[min(int(t // 10.0), len(test_sticks) - 1)]
+
+def main():
+    import physicsthread
+    import simulation
+
+    parser = argparse.ArgumentParser(description = 'Fly the left and right winch controller with a scripted stick, and report its timing')
+    parser.add_argument('--mode', choices = ['gliding', 'flapping'], default = 'flapping')
+    parser.add_argument('--seconds', type = float, default = 80.0, help = 'headless, as fast as it steps')
+    parser.add_argument('--realtime', type = float, default = 5.0, help = 'then this many seconds on the physics thread at normal speed, for the jitter')
+    args = parser.parse_args()
+
+    sim = simulation.Simulation(simulation.Config(args.mode, winch_controller = True))
+    controller = sim.winch_controller
+    controller.joystick = ScriptedJoystick(test_stick)
+    steps_per_phase = int(round(10.0 / sim.config.dt))
+    for phase in range(int(round(args.seconds / 10.0))):
+        distance = sim.get_distance()
+        airspeed = 0.0
+        for i in range(steps_per_phase):
+            sim.step(1)
+            airspeed += sim.get_airspeed()
+        print('stick %-12s airspeed %5.2f m/s, %6.1f m flown, height %6.1f m' % (test_stick(phase * 10.0), airspeed / steps_per_phase, sim.get_distance() - distance, sim.get_height()))
+    print('\n'.join(controller.get_report_lines()))
+
+    if args.realtime > 0.0:
+        controller.joystick = SimulatedJoystick()
+        controller.latency = profiler.Histogram(latency_edges)
+        controller.overruns = 0
+        controller.period = sim.config.dt
+        controller.last_tick_time = None
+        physics = physicsthread.PhysicsThread(sim)
+        physics.start()
+        time.sleep(args.realtime)
+        physics.stop()
+        print('\n'.join(controller.get_report_lines()))
+
+if __name__ == '__main__':
+    main()